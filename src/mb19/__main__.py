@@ -0,0 +1,165 @@
+"""
+Headless command line interface for simulations and NCA.
+
+    python -m mb19 simulate --model absorption_first_order --dose 100 --ka 1 --ke 0.2 -o sim.csv
+    python -m mb19 nca sim.csv --column A_central --volume 10 --dose 100
+    python -m mb19 startup --budget 0.5
+
+Run from the `src` directory (or with `src` on the PYTHONPATH).
+Intended for short-lived cluster tasks: only numpy is imported at startup,
+scipy is imported on the code paths which need it and matplotlib/pandas
+are never imported. `startup` checks the import time of the CLI against a
+budget and that no slow modules are imported by simulate and NCA of all
+models (also checked by `tests/test_startup.py`).
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SPYDER_DIR = Path(__file__).parent / "spyder"
+
+# modules which must not be imported by the headless code paths
+SLOW_MODULES = ["matplotlib", "pandas", "scipy.stats", "scipy.integrate", "scipy.linalg"]
+
+MODELS = {
+    "absorption_first_order": ["A_tablet", "A_central", "A_urine"],
+    "compartment_model": ["A_tablet", "A_central", "B_central", "A_urine", "B_urine"],
+}
+
+
+def simulate(args) -> int:
+    """Simulate a single dose and write the time course as CSV."""
+    import numpy as np
+
+    t = np.linspace(0, args.end, args.steps + 1)
+    if args.model == "absorption_first_order":
+        from helpers import simulate_first_order_absorption
+
+        x = simulate_first_order_absorption(args.dose, args.ka, args.ke, t)
+    else:
+        from linear import rate_matrix_compartment_model, simulate_linear
+
+        A = rate_matrix_compartment_model(args.ka, args.km, args.ke)
+        x = simulate_linear(A, [args.dose, 0, 0, 0, 0], t)[0]
+
+    names = ["time"] + MODELS[args.model]
+    np.savetxt(
+        args.output or sys.stdout, np.column_stack([t, x]), delimiter=",",
+        header=",".join(names), comments="",
+    )
+    return 0
+
+
+def nca(args) -> int:
+    """NCA of one concentration column of a time course CSV, printed as JSON."""
+    import numpy as np
+    from nca import PK_UNITS, f_pk_batch
+
+    with open(args.path) as f_csv:
+        names = f_csv.readline().strip().split(",")
+    data = np.loadtxt(args.path, delimiter=",", skiprows=1, ndmin=2)
+    t = data[:, names.index("time")]
+    c = data[:, names.index(args.column)] / args.volume
+
+    pk = f_pk_batch(t, c, args.dose, lambda_z=args.lambda_z, auc_method=args.auc_method)
+    result = {key: float(value[0]) for key, value in pk.items()}
+    result.update({f"{key}_unit": unit for key, unit in PK_UNITS.items()})
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def check_startup(model: str = "absorption_first_order", repeat: int = 3) -> dict:
+    """Startup time of a simulate + NCA process and the slow modules it imports.
+
+    :param model: model of the simulate command
+    :param repeat: number of processes, the minimal times are reported
+    :return: dict with import_time and total_time [s] and list of slow modules
+    """
+    code = (
+        "import sys, time; start = time.perf_counter(); "
+        "import mb19.__main__ as cli; elapsed = time.perf_counter() - start; "
+        "cli.main(['simulate', '--model', sys.argv[2], '-o', sys.argv[1]]); "
+        "cli.main(['nca', sys.argv[1], '--dose', '100']); "
+        f"slow = [m for m in {SLOW_MODULES!r} if m in sys.modules]; "
+        "print(elapsed, ','.join(slow))"
+    )
+    times = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-c", code, str(Path(tmp_dir) / "sim.csv"), model],
+                capture_output=True, text=True, cwd=Path(__file__).parent.parent,
+                check=True,
+            )
+            total = time.perf_counter() - start
+            *_, line = proc.stdout.strip().splitlines()
+            elapsed, _, slow = line.partition(" ")
+            times.append((float(elapsed), total))
+
+    return {
+        "import_time": min(t[0] for t in times),
+        "total_time": min(t[1] for t in times),
+        "slow_modules": slow.split(",") if slow else [],
+    }
+
+
+def startup(args) -> int:
+    """Check the startup time of the CLI and the modules imported by simulate/NCA."""
+    ok = True
+    for model in MODELS:
+        result = check_startup(model, repeat=args.repeat)
+        print(f"{model}: import time: {result['import_time']:.3f} s, simulate + NCA "
+              f"process: {result['total_time']:.3f} s (budget {args.budget:.3f} s)")
+        if result["total_time"] > args.budget:
+            ok = False
+        if result["slow_modules"]:
+            print(f"{model}: slow modules imported: {result['slow_modules']}")
+            ok = False
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+def main(argv=None) -> int:
+    # the course modules use flat imports (`from helpers import ...`)
+    if str(SPYDER_DIR) not in sys.path:
+        sys.path.insert(0, str(SPYDER_DIR))
+
+    parser = argparse.ArgumentParser(prog="mb19", description=__doc__.split("\n\n")[0].strip())
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("simulate", help=simulate.__doc__)
+    p.add_argument("--model", choices=list(MODELS), default="absorption_first_order")
+    p.add_argument("--dose", type=float, default=100.0, help="dose [mg]")
+    p.add_argument("--ka", type=float, default=1.0, help="absorption rate [1/hr]")
+    p.add_argument("--km", type=float, default=1.0, help="metabolism rate [1/hr]")
+    p.add_argument("--ke", type=float, default=0.2, help="elimination rate [1/hr]")
+    p.add_argument("--end", type=float, default=24.0, help="end time [hr]")
+    p.add_argument("--steps", type=int, default=240, help="number of time steps")
+    p.add_argument("-o", "--output", help="CSV file (default: stdout)")
+    p.set_defaults(func=simulate)
+
+    p = subparsers.add_parser("nca", help=nca.__doc__)
+    p.add_argument("path", help="time course CSV with column 'time'")
+    p.add_argument("--column", default="A_central", help="amount or concentration column")
+    p.add_argument("--volume", type=float, default=1.0, help="volume c = column/volume [l]")
+    p.add_argument("--dose", type=float, required=True, help="dose [mg]")
+    p.add_argument("--lambda-z", choices=["all", "best"], default="all")
+    p.add_argument("--auc-method", choices=["linear", "linear-up/log-down"], default="linear")
+    p.set_defaults(func=nca)
+
+    p = subparsers.add_parser("startup", help=startup.__doc__)
+    p.add_argument("--budget", type=float, default=0.5, help="time budget [s]")
+    p.add_argument("--repeat", type=int, default=3, help="number of repeats")
+    p.set_defaults(func=startup)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
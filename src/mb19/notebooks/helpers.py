@@ -1,4 +1,3 @@
-from scipy import stats
 import numpy as np
 
 
@@ -17,6 +16,8 @@ def print_pk(pk):
 
 def f_pk(t, c, dose, show: bool = False):
     """Calculate PK information."""
+    from scipy import stats  # imported lazily, slow import
+
     dose_unit = "mg"
     t_unit = "hr"
     c_unit = "mg/l"
@@ -90,3 +91,60 @@ def dxdt_absorption_first_order(x, t, ka, ke):
         va - ve,  # dA_central/dt [mg/hr]
         ve,  # dA_urine/dt  [mg/hr]
     ]
+
+
+def simulate_first_order_absorption(dose, ka, ke, t):
+    """Analytical solution of the first order absorption model (Bateman function).
+
+    Parameters are broadcast against each other, so scans and populations are
+    evaluated in a single call. Near-equal rate constants (ka == ke) use the
+    limit solution dose * ka * t * exp(-ka * t). Parameter sets for which the
+    analytical solution is not finite (e.g. overflow) are simulated
+    with odeint instead.
+
+    :param dose: dose in A_tablet at t[0] [mg]
+    :param ka: absorption rate [1/hr]
+    :param ke: elimination rate [1/hr]
+    :param t: time points [hr]
+    :return: states [A_tablet, A_central, A_urine] with shape
+        broadcast(dose, ka, ke) + (n_times, 3)
+    """
+    dose, ka, ke = np.broadcast_arrays(
+        np.asarray(dose, dtype=float),
+        np.asarray(ka, dtype=float),
+        np.asarray(ke, dtype=float),
+    )
+    shape = dose.shape
+    t = np.asarray(t, dtype=float)
+    tau = t - t[0]
+
+    dose = dose.reshape(-1, 1)
+    ka = ka.reshape(-1, 1)
+    ke = ke.reshape(-1, 1)
+
+    # exp(-kmin*t) * (1 - exp(-d*t))/d is stable for ka < ke and ka > ke
+    kmin = np.minimum(ka, ke)
+    d = np.abs(ka - ke)
+    dt = d * tau
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        phi = np.where(
+            dt < 1e-6,
+            tau * (1.0 - 0.5 * dt),  # limit ka -> ke
+            -np.expm1(-dt) / d,
+        )
+        x = np.empty((dose.shape[0], t.size, 3))
+        x[:, :, 0] = dose * np.exp(-ka * tau)  # A_tablet
+        x[:, :, 1] = dose * ka * np.exp(-kmin * tau) * phi  # A_central
+        x[:, :, 2] = dose - x[:, :, 0] - x[:, :, 1]  # A_urine
+
+    # fallback to the numerical solution for non-standard inputs
+    invalid = ~np.all(np.isfinite(x), axis=(1, 2))
+    if np.any(invalid):
+        from scipy.integrate import odeint  # imported lazily, slow import
+    for k in np.flatnonzero(invalid):
+        x[k] = odeint(
+            dxdt_absorption_first_order, [dose[k, 0], 0.0, 0.0], t,
+            args=(ka[k, 0], ke[k, 0])
+        )
+
+    return x.reshape(shape + (t.size, 3))
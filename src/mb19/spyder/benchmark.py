@@ -0,0 +1,391 @@
+"""
+Benchmark suite of the simulation helpers.
+
+Measures runtime and peak memory of the simulation approaches of the course
+for the models (first order absorption, 5-state compartment model, transit
+chain, caffeine PBPK):
+
+- odeint with the Python ODE function
+- closed form and linear engine (`helpers`, `linear`, `dosing`)
+- RoadRunner (skipped if roadrunner is not installed)
+
+across scan widths (10 -> 100k parameter sets) and dosing counts.
+Results are stored as JSON baseline and compared against it with
+regression thresholds:
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json --threshold 1.25
+    python benchmark.py --filter scan_closed_form
+
+Runtime is the minimum over repeats of the mean time per call. Peak memory
+is measured with tracemalloc (numpy arrays are traced, the internal work
+arrays of the Fortran solvers are not). The exit code is 1 if a
+regression was found.
+"""
+import argparse
+import json
+import platform
+import re
+import sys
+import timeit
+import tracemalloc
+from functools import partial
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import scipy
+from scipy.integrate import odeint
+
+NOTEBOOKS_DIR = Path(__file__).parent.parent / "notebooks"
+
+# registered benchmarks {name: setup}, setup() returns the function to time
+BENCHMARKS = {}
+
+T = np.linspace(0, 24, 241)  # [hr]
+DOSE = 100.0  # [mg]
+SCAN_WIDTHS = [10, 100, 1000, 10000, 100000]
+DOSE_COUNTS = [1, 10, 100]
+
+
+class SkipBenchmark(Exception):
+    """Benchmark is not available, e.g. missing optional dependency."""
+
+
+def benchmark(name: str, **axes):
+    """Register a benchmark setup for all combinations of the axes values.
+
+        @benchmark("scan", n=[10, 100])
+        def scan(n):
+            ...  # setup
+            return lambda: ...  # timed function
+    """
+    def decorator(setup):
+        keys = list(axes)
+        for values in product(*axes.values()):
+            kwargs = dict(zip(keys, values))
+            label = ",".join(f"{key}={value}" for key, value in kwargs.items())
+            BENCHMARKS[f"{name}[{label}]" if label else name] = partial(setup, **kwargs)
+        return setup
+    return decorator
+
+
+def _rates(n: int, seed: int = 42):
+    """Log-uniform ka and ke of n parameter sets."""
+    rng = np.random.default_rng(seed)
+    ka = np.exp(rng.uniform(np.log(0.1), np.log(10), n))
+    ke = np.exp(rng.uniform(np.log(0.05), np.log(2), n))
+    return ka, ke
+
+
+# --- single simulations -------------------------------------------------------
+@benchmark("absorption_first_order_odeint")
+def absorption_first_order_odeint():
+    from helpers import dxdt_absorption_first_order
+
+    return lambda: odeint(dxdt_absorption_first_order, [DOSE, 0, 0], T, args=(1.0, 0.2))
+
+
+@benchmark("absorption_first_order_closed_form")
+def absorption_first_order_closed_form():
+    from helpers import simulate_first_order_absorption
+
+    return lambda: simulate_first_order_absorption(DOSE, 1.0, 0.2, T)
+
+
+@benchmark("compartment_model_odeint")
+def compartment_model_odeint():
+    from stoichiometry import compartment_model
+
+    return lambda: odeint(
+        compartment_model.dxdt, [DOSE, 0, 0, 0, 0], T, args=(1.0, 0.5, 0.2)
+    )
+
+
+@benchmark("compartment_model_odeint_jacobian")
+def compartment_model_odeint_jacobian():
+    from stoichiometry import compartment_model
+
+    return lambda: compartment_model.simulate([DOSE, 0, 0, 0, 0], T, 1.0, 0.5, 0.2)
+
+
+@benchmark("compartment_model_odeint_handwritten")
+def compartment_model_odeint_handwritten():
+    return lambda: odeint(
+        _dydt_compartment_model, [DOSE, 0, 0, 0, 0], T, args=(1.0, 0.5, 0.2)
+    )
+
+
+@benchmark("compartment_model_rhs", impl=["handwritten", "stoichiometric"])
+def compartment_model_rhs(impl):
+    from stoichiometry import compartment_model
+
+    dxdt = _dydt_compartment_model if impl == "handwritten" else compartment_model.dxdt
+    x = np.array([DOSE, 10.0, 5.0, 1.0, 1.0])
+    return lambda: dxdt(x, 0.0, 1.0, 0.5, 0.2)
+
+
+@benchmark("compartment_model_jacobian")
+def compartment_model_jacobian():
+    from stoichiometry import compartment_model
+
+    x = np.array([DOSE, 10.0, 5.0, 1.0, 1.0])
+    return lambda: compartment_model.jacobian(x, 0.0, 1.0, 0.5, 0.2)
+
+
+def _dydt_compartment_model(x, t, ka, km, ke):
+    """Handwritten ODE function of `compartment_model.py` (reference)."""
+    va = ka * x[0]
+    vm = km * x[1]
+    vuA = ke * x[1]
+    vuB = ke * x[2]
+    return [-va, va - vm - vuA, vm - vuB, vuA, vuB]
+
+
+@benchmark("compartment_model_linear")
+def compartment_model_linear():
+    from linear import rate_matrix_compartment_model, simulate_linear
+
+    A = rate_matrix_compartment_model(1.0, 0.5, 0.2)
+    return lambda: simulate_linear(A, [DOSE, 0, 0, 0, 0], T)
+
+
+@benchmark("transit_chain_odeint", n_transit=[4, 20])
+def transit_chain_odeint(n_transit):
+    from stoichiometry import absorption_chain_model
+
+    model = absorption_chain_model(n_transit)
+    x0 = np.zeros(len(model.species))
+    x0[0] = DOSE
+    return lambda: odeint(model.dxdt, x0, T, args=(1.0, 0.2))
+
+
+@benchmark("transit_chain_banded", n_transit=[4, 20])
+def transit_chain_banded(n_transit):
+    from transit import TransitChainModel
+
+    model = TransitChainModel(n_transit)
+    return lambda: model.simulate(DOSE, T, 1.0, 0.2)
+
+
+@benchmark("absorption_first_order_roadrunner")
+def absorption_first_order_roadrunner():
+    r = _load_roadrunner("absorption_first_order.xml")
+
+    def run():
+        r.resetToOrigin()
+        return r.simulate(start=0, end=24, steps=240)
+    return run
+
+
+@benchmark("pbpk_caffeine_roadrunner")
+def pbpk_caffeine_roadrunner():
+    r = _load_roadrunner("caffeine_body_flat.xml")
+
+    def run():
+        r.resetToOrigin()
+        return r.simulate(start=0, end=24 * 60, steps=500)
+    return run
+
+
+def _load_roadrunner(filename: str):
+    try:
+        import roadrunner
+    except ImportError:
+        raise SkipBenchmark("roadrunner is not installed")
+    return roadrunner.RoadRunner(str(NOTEBOOKS_DIR / filename))
+
+
+# --- scans --------------------------------------------------------------------
+@benchmark("scan_odeint_loop", n=SCAN_WIDTHS[:2])
+def scan_odeint_loop(n):
+    from helpers import dxdt_absorption_first_order
+
+    ka, ke = _rates(n)
+    return lambda: [
+        odeint(dxdt_absorption_first_order, [DOSE, 0, 0], T, args=(ka[k], ke[k]))
+        for k in range(n)
+    ]
+
+
+@benchmark("scan_odeint_population", n=SCAN_WIDTHS[:4])
+def scan_odeint_population(n):
+    from helpers import dxdt_absorption_first_order
+    from population import simulate_population
+
+    ka, ke = _rates(n)
+    return lambda: simulate_population(
+        dxdt_absorption_first_order, [DOSE, 0, 0], T, args=(ka, ke)
+    )
+
+
+@benchmark("scan_closed_form", n=SCAN_WIDTHS)
+def scan_closed_form(n):
+    from helpers import simulate_first_order_absorption
+
+    ka, ke = _rates(n)
+    return lambda: simulate_first_order_absorption(DOSE, ka, ke, T)
+
+
+@benchmark("scan_compartment_model_linear", n=SCAN_WIDTHS[:4])
+def scan_compartment_model_linear(n):
+    from linear import rate_matrix_compartment_model, simulate_linear
+
+    ka, ke = _rates(n)
+    A = rate_matrix_compartment_model(ka, 0.5, ke)
+    return lambda: simulate_linear(A, [DOSE, 0, 0, 0, 0], T)
+
+
+@benchmark("scan_roadrunner_loop", n=SCAN_WIDTHS[:2])
+def scan_roadrunner_loop(n):
+    r = _load_roadrunner("absorption_first_order.xml")
+    ka, ke = _rates(n)
+
+    def run():
+        for k in range(n):
+            r.resetToOrigin()
+            r.setValue("ka", ka[k])
+            r.setValue("ke", ke[k])
+            r.simulate(start=0, end=24, steps=240)
+    return run
+
+
+# --- dosing -------------------------------------------------------------------
+@benchmark("dosing_linear", n_doses=DOSE_COUNTS)
+def dosing_linear(n_doses):
+    from dosing import dose_schedule, simulate_multi_dosing_linear
+    from linear import rate_matrix_absorption_first_order
+
+    t = np.linspace(0, 12 * max(n_doses, 2), 10 * 12 * max(n_doses, 2) + 1)
+    dose_times, dose_amounts = dose_schedule(n_doses, tau=12, dose=DOSE)
+    A = rate_matrix_absorption_first_order(1.0, 0.2)
+    return lambda: simulate_multi_dosing_linear(A, t, dose_times, dose_amounts)
+
+
+@benchmark("dosing_events_odeint", n_doses=DOSE_COUNTS)
+def dosing_events_odeint(n_doses):
+    from dosing import dose_schedule
+    from events import bolus_events, simulate_events
+    from helpers import dxdt_absorption_first_order
+
+    t = np.linspace(0, 12 * max(n_doses, 2), 10 * 12 * max(n_doses, 2) + 1)
+    events = bolus_events(*dose_schedule(n_doses, tau=12, dose=DOSE))
+    return lambda: simulate_events(
+        dxdt_absorption_first_order, [0, 0, 0], t, events, args=(1.0, 0.2)
+    )
+
+
+# --- runner -------------------------------------------------------------------
+def measure(func, repeat: int = 5) -> dict:
+    """Runtime per call [s] (minimum over repeats) and peak memory [bytes]."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    time = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": time, "peak_memory": peak, "number": number}
+
+
+def run(pattern: str = None, repeat: int = 5) -> dict:
+    """Run all benchmarks matching the regular expression pattern."""
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        try:
+            func = setup()
+        except SkipBenchmark as err:
+            print(f"{name:<50} skipped: {err}")
+            continue
+        results[name] = measure(func, repeat=repeat)
+        print(
+            f"{name:<50} {results[name]['time'] * 1e3:12.4f} ms "
+            f"{results[name]['peak_memory'] / 2**20:10.2f} MiB"
+        )
+    return results
+
+
+def environment() -> dict:
+    """Versions and platform of the benchmark run."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def save_baseline(results: dict, path: Path):
+    with open(path, "w") as f_json:
+        json.dump({"environment": environment(), "benchmarks": results}, f_json, indent=2)
+
+
+def compare(results: dict, path: Path, threshold: float = 1.25,
+            memory_threshold: float = 1.25) -> list:
+    """Compare results with a stored baseline.
+
+    :param results: results of `run`
+    :param path: baseline JSON
+    :param threshold: maximal allowed ratio of runtime / baseline runtime
+    :param memory_threshold: maximal allowed ratio of peak memory / baseline
+    :return: list of regressions (name, metric, ratio)
+    """
+    with open(path) as f_json:
+        baseline = json.load(f_json)["benchmarks"]
+
+    regressions = []
+    print(f"\n{'benchmark':<50} {'time':>8} {'memory':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio_time = result["time"] / baseline[name]["time"]
+        ratio_memory = (result["peak_memory"] + 1) / (baseline[name]["peak_memory"] + 1)
+        flags = []
+        if ratio_time > threshold:
+            regressions.append((name, "time", ratio_time))
+            flags.append("TIME")
+        if ratio_memory > memory_threshold:
+            regressions.append((name, "peak_memory", ratio_memory))
+            flags.append("MEMORY")
+        print(f"{name:<50} {ratio_time:8.2f} {ratio_memory:8.2f} {' '.join(flags)}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--filter", help="regular expression for the benchmark names")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repeats")
+    parser.add_argument("--save", type=Path, help="store results as baseline JSON")
+    parser.add_argument("--compare", type=Path, help="compare with baseline JSON")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="allowed runtime ratio to the baseline")
+    parser.add_argument("--memory-threshold", type=float, default=1.25,
+                        help="allowed peak memory ratio to the baseline")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    results = run(args.filter, repeat=args.repeat)
+    if args.save:
+        save_baseline(results, args.save)
+    if args.compare:
+        regressions = compare(
+            results, args.compare, args.threshold, args.memory_threshold
+        )
+        for name, metric, ratio in regressions:
+            print(f"REGRESSION {name}: {metric} x{ratio:.2f}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
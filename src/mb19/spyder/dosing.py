@@ -0,0 +1,98 @@
+"""
+Multiple dosing for linear models via superposition.
+
+For linear models the response to a dosing regimen is the sum of the
+single dose responses shifted by the dosing times and scaled by the dose
+amounts. The full regimen is therefore calculated on the complete time grid
+without restarting the solver for every dose.
+"""
+import numpy as np
+
+from linear import simulate_linear
+
+
+def dose_schedule(n_doses: int, tau: float, dose: float, start: float = 0.0,
+                  loading_dose: float = None, missed=()):
+    """Create dosing times and amounts for a regular regimen.
+
+    :param n_doses: number of doses
+    :param tau: dosing interval [hr]
+    :param dose: maintenance dose [mg]
+    :param start: time of first dose [hr]
+    :param loading_dose: optional first dose [mg]
+    :param missed: indices of missed doses (amount set to zero)
+    :return: dose_times (n_doses,), dose_amounts (n_doses,)
+    """
+    dose_times = start + tau * np.arange(n_doses)
+    dose_amounts = np.full(n_doses, dose, dtype=float)
+    if loading_dose is not None and n_doses > 0:
+        dose_amounts[0] = loading_dose
+    dose_amounts[list(missed)] = 0.0
+    return dose_times, dose_amounts
+
+
+def simulate_multi_dosing_linear(A, t, dose_times, dose_amounts,
+                                 dose_index: int = 0, x0=None):
+    """Simulate a dosing regimen of a linear model by superposition.
+
+    The dose is added to the state `dose_index` (e.g. A_tablet) at the dosing
+    times; states at a dosing time include the dose. Dosing times on a
+    uniform time grid reuse a single dose response which is shifted along
+    the grid, other dosing times are evaluated with the closed-form solution.
+
+    :param A: rate matrices (n_params, n_states, n_states) or (n_states, n_states)
+    :param t: time points (n_times,)
+    :param dose_times: dosing times (n_doses,)
+    :param dose_amounts: dose amounts (n_doses,) or (n_params, n_doses)
+    :param dose_index: index of the dosed state
+    :param x0: optional initial condition at t[0] (n_states,) or (n_params, n_states)
+    :return: solution (n_params, n_times, n_states)
+    """
+    A = np.asarray(A, dtype=float)
+    if A.ndim == 2:
+        A = A[np.newaxis, :, :]
+    n_params, n_states, _ = A.shape
+    t = np.asarray(t, dtype=float)
+    dose_times = np.atleast_1d(np.asarray(dose_times, dtype=float))
+    dose_amounts = np.broadcast_to(
+        np.asarray(dose_amounts, dtype=float), (n_params, dose_times.size)
+    )
+    e = np.zeros(n_states)
+    e[dose_index] = 1.0
+
+    if x0 is not None:
+        x = simulate_linear(A, x0, t - t[0])
+    else:
+        x = np.zeros((n_params, t.size, n_states))
+
+    offsets = _grid_offsets(t, dose_times)
+    if offsets is not None:
+        # single dose response shifted along the grid
+        response = simulate_linear(A, e, t - t[0])
+        for offset in np.unique(offsets[offsets < t.size]):
+            amount = dose_amounts[:, offsets == offset].sum(axis=1)
+            x[:, offset:] += amount[:, np.newaxis, np.newaxis] * response[:, :t.size - offset]
+    else:
+        for k, t_dose in enumerate(dose_times):
+            idx = np.searchsorted(t, t_dose, side="left")
+            if idx == t.size:
+                continue
+            response = simulate_linear(A, e, t[idx:] - t_dose)
+            x[:, idx:] += dose_amounts[:, k, np.newaxis, np.newaxis] * response
+
+    return x
+
+
+def _grid_offsets(t, dose_times):
+    """Grid indices of the dosing times or None if not on a uniform grid."""
+    if t.size < 2:
+        return None
+    dt = t[1] - t[0]
+    if dt <= 0 or not np.allclose(np.diff(t), dt, rtol=1e-9, atol=0.0):
+        return None
+    offsets = np.rint((dose_times - t[0]) / dt)
+    if np.any(offsets < 0) or not np.allclose(
+        t[0] + offsets * dt, dose_times, rtol=0.0, atol=1e-9 * dt
+    ):
+        return None
+    return offsets.astype(int)
@@ -0,0 +1,137 @@
+"""
+Event-driven dosing for nonlinear models.
+
+Doses, infusions and lag times are discontinuities of the model. Instead of
+restarting the simulation for every dose or switching rates with an
+`if t >= lag` in the ODE function, all events are collected in a sorted
+queue and the integration is split exactly at the event times. The state
+is carried across the events, so any ODE function dxdt(x, t, *args) from
+`helpers.py` can be used unchanged.
+"""
+import heapq
+from typing import NamedTuple
+
+import numpy as np
+from scipy.integrate import odeint
+
+BOLUS = "bolus"
+INFUSION_START = "infusion_start"
+INFUSION_STOP = "infusion_stop"
+PARAMETER = "parameter"
+
+# order of events at identical times
+_PRIORITY = {INFUSION_STOP: 0, PARAMETER: 1, BOLUS: 2, INFUSION_START: 3}
+
+
+class DosingEvent(NamedTuple):
+    """Discontinuity during the simulation.
+
+    kind: BOLUS (add `value` to state `index`), INFUSION_START (constant rate
+    `value` into state `index`), INFUSION_STOP (stop the infusion with rate
+    `value` into state `index`, other infusions continue) or PARAMETER (set
+    argument `index` of the ODE function to `value`).
+    """
+    time: float
+    kind: str
+    index: int
+    value: float = 0.0
+
+
+def bolus_events(dose_times, dose_amounts, index: int = 0, lag: float = 0.0):
+    """Bolus doses into state `index`, optionally delayed by a lag time."""
+    dose_amounts = np.broadcast_to(dose_amounts, np.shape(dose_times))
+    return [
+        DosingEvent(float(t) + lag, BOLUS, index, float(amount))
+        for t, amount in zip(dose_times, dose_amounts)
+    ]
+
+
+def lag_events(lag: float, ka: float, index: int = 0):
+    """Absorption starting after a lag time.
+
+    Sets argument `index` of the ODE function (e.g. ka of
+    `dxdt_absorption_first_order`) to zero until the lag time.
+    """
+    return [
+        DosingEvent(-np.inf, PARAMETER, index, 0.0),
+        DosingEvent(lag, PARAMETER, index, ka),
+    ]
+
+
+def infusion_events(start: float, duration: float, rate: float, index: int = 1):
+    """Constant rate infusion into state `index` [mg/hr]."""
+    return [
+        DosingEvent(start, INFUSION_START, index, rate),
+        DosingEvent(start + duration, INFUSION_STOP, index, rate),
+    ]
+
+
+def simulate_events(dxdt, x0, t, events, args=(), **kwargs):
+    """Simulate the model with dosing events.
+
+    The integration is restarted exactly at every event time. States at an
+    event time are reported after the event was applied.
+
+    :param dxdt: ODE function dxdt(x, t, *args)
+    :param x0: initial condition at t[0]
+    :param t: output time points (sorted)
+    :param events: iterable of DosingEvent
+    :param args: arguments of the ODE function
+    :param kwargs: additional arguments passed to odeint (e.g. rtol, atol)
+    :return: solution (n_times, n_states)
+    """
+    t = np.asarray(t, dtype=float)
+    x_current = np.array(x0, dtype=float)
+    args = list(args)
+    infusion = np.zeros_like(x_current)
+
+    queue = [(e.time, _PRIORITY[e.kind], k, e) for k, e in enumerate(events)]
+    heapq.heapify(queue)
+
+    x = np.empty((t.size, x_current.size))
+    t_current = t[0]
+    k = 0
+    while True:
+        # apply all events up to the current time
+        while queue and queue[0][0] <= t_current:
+            event = heapq.heappop(queue)[3]
+            if event.kind == BOLUS:
+                x_current[event.index] += event.value
+            elif event.kind == INFUSION_START:
+                infusion[event.index] += event.value
+            elif event.kind == INFUSION_STOP:
+                infusion[event.index] -= event.value
+            elif event.kind == PARAMETER:
+                args[event.index] = event.value
+            else:
+                raise ValueError(f"Unsupported event kind: '{event.kind}'")
+
+        # outputs at the current time include the applied events
+        t_next = queue[0][0] if queue else np.inf
+        k_end = np.searchsorted(t, t_next, side="left")
+        while k < k_end and t[k] <= t_current:
+            x[k] = x_current
+            k += 1
+
+        # integrate to the next event or the end of the time course
+        stop = t_next > t[-1]
+        tvec = t[k:k_end] if stop else np.append(t[k:k_end], t_next)
+        if tvec.size > 0:
+            if np.any(infusion):
+                f, f_args = _dxdt_infusion, (dxdt, infusion.copy(), tuple(args))
+            else:
+                f, f_args = dxdt, tuple(args)
+            y = odeint(f, x_current, np.append(t_current, tvec), args=f_args, **kwargs)
+            x[k:k_end] = y[1:k_end - k + 1]
+            x_current = y[-1].copy()
+        k = k_end
+        if stop:
+            break
+        t_current = t_next
+
+    return x
+
+
+def _dxdt_infusion(x, t, dxdt, infusion, args):
+    """ODE function with additional constant infusion rates."""
+    return np.asarray(dxdt(x, t, *args)) + infusion
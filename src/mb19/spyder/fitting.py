@@ -0,0 +1,179 @@
+"""
+Parameter estimation from concentration-time data.
+
+Fits ka, CL and V of the first order absorption model
+(`dxdt_absorption_first_order` with ke = CL/V and c = A_central/V) with
+`scipy.optimize.least_squares`. Residuals are vectorized over the time
+points and the Jacobian is analytical, parameters are fitted on
+logarithmic scale. Every fit is started from multiple Latin hypercube
+initial guesses, and many subjects are fitted in parallel processes.
+
+Other compartment models (`stoichiometry.StoichiometricModel`) are fitted
+with Jacobians from the forward sensitivities.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy import optimize
+from scipy.stats import qmc
+
+from sensitivity import simulate_sensitivities
+
+PARAMETERS = ["ka", "CL", "V"]
+
+BOUNDS = {
+    "ka": (0.01, 100.0),  # [1/hr]
+    "CL": (0.01, 100.0),  # [l/hr]
+    "V": (0.1, 1000.0),  # [l]
+}
+
+
+def concentration_first_order_absorption(t, dose, ka, CL, V, jac: bool = False):
+    """Concentration c = A_central/V of the first order absorption model.
+
+    :param t: time points after the dose [hr]
+    :param dose: dose [mg]
+    :param ka: absorption rate [1/hr]
+    :param CL: clearance [l/hr]
+    :param V: volume [l]
+    :param jac: also return the derivatives with respect to (ka, CL, V)
+    :return: c (n_times,) [mg/l] and if jac: dc/dp (n_times, 3)
+    """
+    t = np.asarray(t, dtype=float)
+    ke = CL / V
+    d = ka - ke
+    z = 0.5 * d * t
+    m = 0.5 * (ka + ke)
+    small = np.abs(z) < 1e-3
+
+    # g = (exp(-ke t) - exp(-ka t))/(ka - ke), limit t*exp(-ka t) for ka == ke
+    with np.errstate(divide="ignore", invalid="ignore"):
+        e_ka, e_ke = np.exp(-ka * t), np.exp(-ke * t)
+        g = np.where(small, t * np.exp(-m * t) * (1 + z ** 2 / 6), (e_ke - e_ka) / d)
+    c = dose * ka * g / V
+    if not jac:
+        return c
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ds = t ** 2 * np.exp(-m * t) * (z / 3 + z ** 3 / 30) / 2  # series of dg/dd
+        dg_dka = np.where(small, -t * g / 2 + ds, (t * e_ka - g) / d)
+        dg_dke = np.where(small, -t * g / 2 - ds, (g - t * e_ke) / d)
+
+    dc = np.empty((t.size, 3))
+    dc[:, 0] = dose / V * (g + ka * dg_dka)
+    dc[:, 1] = dose * ka / V * dg_dke / V
+    dc[:, 2] = -c / V - dose * ka / V * dg_dke * CL / V ** 2
+    return c, dc
+
+
+def fit_first_order_absorption(t, c, dose: float, n_starts: int = 10,
+                               bounds: Dict[str, Tuple[float, float]] = BOUNDS,
+                               seed=None, **kwargs):
+    """Fit ka, CL and V to a concentration-time curve with multi-start.
+
+    :param t: time points [hr]
+    :param c: measured concentrations [mg/l], NaN for missing values
+    :param dose: dose [mg]
+    :param n_starts: number of Latin hypercube initial guesses
+    :param bounds: parameter bounds {name: (lower, upper)}
+    :param seed: seed of the Latin hypercube
+    :param kwargs: additional arguments passed to least_squares
+    :return: dict with the parameters, cost and success of the best fit
+    """
+    t = np.asarray(t, dtype=float)
+    c = np.asarray(c, dtype=float)
+    mask = ~np.isnan(t) & ~np.isnan(c)
+    t, c = t[mask], c[mask]
+
+    lower = np.log([bounds[key][0] for key in PARAMETERS])
+    upper = np.log([bounds[key][1] for key in PARAMETERS])
+
+    def residuals(theta):
+        return concentration_first_order_absorption(t, dose, *np.exp(theta)) - c
+
+    def jacobian(theta):
+        p = np.exp(theta)
+        _, dc = concentration_first_order_absorption(t, dose, *p, jac=True)
+        return dc * p  # chain rule for logarithmic parameters
+
+    starts = qmc.scale(qmc.LatinHypercube(d=3, seed=seed).random(n_starts), lower, upper)
+    best = None
+    for theta0 in starts:
+        result = optimize.least_squares(
+            residuals, theta0, jac=jacobian, bounds=(lower, upper), **kwargs
+        )
+        if best is None or result.cost < best.cost:
+            best = result
+
+    p = np.exp(best.x)
+    return {**dict(zip(PARAMETERS, p)), "cost": best.cost, "success": best.success}
+
+
+def fit_population(t, c, dose, n_workers: int = None, chunksize: int = 16, **kwargs):
+    """Fit all concentration-time curves in parallel processes.
+
+    :param t: time points (n_times,) [hr]
+    :param c: concentrations (n_subjects, n_times) [mg/l]
+    :param dose: dose, scalar or (n_subjects,) [mg]
+    :param n_workers: number of worker processes (default: number of cpus)
+    :param chunksize: number of subjects per task
+    :param kwargs: arguments of `fit_first_order_absorption`
+    :return: dict of arrays (n_subjects,) with ka, CL, V, cost and success
+    """
+    c = np.atleast_2d(np.asarray(c, dtype=float))
+    n_subjects = c.shape[0]
+    doses = np.broadcast_to(np.asarray(dose, dtype=float), (n_subjects,))
+    fit = partial(_fit_subject, t=np.asarray(t, dtype=float), kwargs=kwargs)
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        fits = list(map(fit, c, doses))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            fits = list(executor.map(fit, c, doses, chunksize=chunksize))
+
+    return {key: np.array([f[key] for f in fits]) for key in fits[0]}
+
+
+def _fit_subject(c, dose, t, kwargs):
+    """Fit a single subject (picklable for the process pool)."""
+    return fit_first_order_absorption(t, c, dose, **kwargs)
+
+
+def fit_model(model, x0, t, y, output: int, p0, bounds=(0.0, np.inf), **kwargs):
+    """Fit parameters of a StoichiometricModel with sensitivity Jacobian.
+
+    :param model: StoichiometricModel
+    :param x0: initial condition
+    :param t: time points, t[0] is the time of x0
+    :param y: measured amounts of the output species, NaN for missing values
+    :param output: index of the measured species
+    :param p0: initial parameters in the order of `model.parameters`
+    :param bounds: parameter bounds of least_squares
+    :param kwargs: additional arguments passed to least_squares
+    :return: scipy.optimize.OptimizeResult
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = ~np.isnan(y)
+    cache = {}
+
+    def simulate(p):
+        key = tuple(p)
+        if key not in cache:
+            cache.clear()
+            cache[key] = simulate_sensitivities(model, x0, t, *p)
+        return cache[key]
+
+    def residuals(p):
+        x, _ = simulate(p)
+        return x[mask, output] - y[mask]
+
+    def jacobian(p):
+        _, S = simulate(p)
+        return S[mask, output, :]
+
+    return optimize.least_squares(residuals, p0, jac=jacobian, bounds=bounds, **kwargs)
@@ -0,0 +1,160 @@
+"""
+Instrumentation of simulations: solver statistics and per-phase timing.
+
+Records for every simulation run the number of ODE function (RHS) and
+Jacobian evaluations, the solver steps and method switches of LSODA
+(stiff BDF <-> non-stiff Adams) and the wall time split into phases
+(solve, post-processing, NCA, ...). The runs are exported as metrics table
+and summarized for a whole scan:
+
+    instrument = Instrument()
+    for ka in kas:
+        with instrument.run(ka=ka):
+            x = instrument.odeint(dxdt_absorption_first_order, x0, t, args=(ka, ke))
+            with instrument.phase("postprocess"):
+                c = x[:, 1] / Vd
+            with instrument.phase("nca"):
+                pk = f_pk(t, c, dose)
+    df = instrument.table()
+    print(instrument.summary())
+
+LSODA does not report rejected steps, therefore only accepted steps
+(`nst`) are recorded. `nfe` and `nje` are the evaluation counts reported
+by LSODA, `n_rhs` and `n_jac` are counted by wrapping the functions.
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.integrate import odeint
+
+# LSODA method indicators of `mused`
+METHODS = {1: "adams", 2: "bdf"}
+
+
+class Instrument:
+    """Collect solver statistics and phase timings of simulation runs."""
+
+    def __init__(self):
+        self.runs = []
+        self.labels = set()  # keys of the run labels, not aggregated as metrics
+        self._record = None
+
+    @contextmanager
+    def run(self, **labels):
+        """Record a simulation run, labels (e.g. parameters) are added to the table."""
+        self.labels.update(labels)
+        record = dict(labels)
+        record["run"] = len(self.runs)
+        self._record = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["time_total"] = time.perf_counter() - start
+            self._record = None
+            self.runs.append(record)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a phase of the current run, repeated phases are accumulated."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(f"time_{name}", time.perf_counter() - start)
+
+    def odeint(self, func, y0, t, args=(), Dfun=None, **kwargs):
+        """odeint with counted RHS/Jacobian evaluations and solver statistics.
+
+        Timed as phase "solve". Called outside of `run` it records its own run.
+        """
+        if self._record is None:
+            with self.run():
+                return self.odeint(func, y0, t, args=args, Dfun=Dfun, **kwargs)
+
+        counts = {"n_rhs": 0, "n_jac": 0}
+
+        def rhs(*a):
+            counts["n_rhs"] += 1
+            return func(*a)
+
+        def jac(*a):
+            counts["n_jac"] += 1
+            return Dfun(*a)
+
+        with self.phase("solve"):
+            y, info = odeint(
+                rhs, y0, t, args=args, Dfun=jac if Dfun is not None else None,
+                full_output=True, **kwargs
+            )
+        for key, value in counts.items():
+            self._add(key, value)
+        self._add_solver_info(info)
+        return y
+
+    def roadrunner(self, r, *args, **kwargs):
+        """RoadRunner `simulate` timed as phase "solve".
+
+        RoadRunner does not expose the CVODE statistics, only the integrator
+        and the number of returned points are recorded.
+        """
+        if self._record is None:
+            with self.run():
+                return self.roadrunner(r, *args, **kwargs)
+
+        with self.phase("solve"):
+            s = r.simulate(*args, **kwargs)
+        self._record["integrator"] = r.getIntegrator().getName()
+        self._add("n_points", s.shape[0])
+        return s
+
+    def _add(self, key: str, value):
+        if self._record is not None:
+            self._record[key] = self._record.get(key, 0) + value
+
+    def _add_solver_info(self, info: dict):
+        """Statistics from the odeint infodict (values are cumulative per output time)."""
+        nst, nfe, nje = info["nst"], info["nfe"], info["nje"]
+        mused = info["mused"][nst > 0]  # no method at output times before the first step
+        self._add("n_steps", int(nst[-1]))
+        self._add("nfe", int(nfe[-1]))
+        self._add("nje", int(nje[-1]))
+        self._add("n_method_switches", int(np.count_nonzero(np.diff(mused))))
+        self._record["method"] = METHODS.get(int(mused[-1]), "") if mused.size else ""
+        self._record["message"] = info["message"]
+        hu = info["hu"][nst > 0]
+        if hu.size:
+            self._record["step_min"] = min(self._record.get("step_min", np.inf), hu.min())
+            self._record["step_max"] = max(self._record.get("step_max", 0.0), hu.max())
+
+    def table(self):
+        """Metrics of all runs as DataFrame (one row per run)."""
+        import pandas as pd
+
+        df = pd.DataFrame(self.runs)
+        if "run" in df:
+            df = df.set_index("run")
+        return df
+
+    def summary(self):
+        """Summary report of all runs (e.g. a scan).
+
+        :return: DataFrame with total, mean, min and max of every metric (run
+            labels excluded); the time phases additionally with their fraction
+            of the total time
+        """
+        df = self.table().drop(columns=list(self.labels), errors="ignore")
+        df = df.select_dtypes(include="number")
+        summary = df.agg(["sum", "mean", "min", "max"]).T
+        summary.columns = ["total", "mean", "min", "max"]
+        if "time_total" in df:
+            times = [c for c in df.columns if c.startswith("time_")]
+            summary.loc[times, "fraction"] = (
+                summary.loc[times, "total"] / summary.loc["time_total", "total"]
+            )
+        return summary
+
+    def reset(self):
+        self.runs.clear()
+        self.labels.clear()
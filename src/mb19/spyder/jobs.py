@@ -0,0 +1,261 @@
+"""
+Declarative batch jobs with checkpoint and resume.
+
+A job is defined by a JSON or TOML spec instead of module-level globals
+which are edited (and reset by hand) in the scan scripts:
+
+    # scan.toml
+    model = "compartment_model"      # model of `MODELS`
+    method = "linear"                # "linear" (closed form) or "odeint"
+    shard_size = 1000                # parameter sets per shard
+    n_workers = 4                    # parallel processes (default: number of cpus)
+    outputs = ["A_central", "B_central"]
+
+    [parameters]                     # fixed parameters
+    ka = 1.0
+    km = 1.0
+    ke = 1.0
+    dose = 100.0                     # [mg] into `dose_species` (default first species)
+    volume = 10.0                    # [l] for the NCA concentrations
+
+    [scan]                           # scanned parameters (full factorial grid)
+    ka = {start = 0.1, stop = 10.0, num = 100, log = true}
+    ke = [0.1, 0.5, 1.0]
+
+    [time]
+    start = 0.0
+    stop = 24.0
+    num = 241
+
+    [nca]
+    output = "A_central"
+    metrics = ["auc", "cmax", "tmax", "thalf"]
+
+Run with `python jobs.py scan.toml results/`. The parameter sets are split
+into shards which are simulated in parallel processes; every completed
+shard is written atomically to the result directory. A killed job is
+resumed by running the same command again, completed shards are skipped.
+The results are loaded with `load_results`.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from scan import parameter_grid
+from stoichiometry import absorption_chain_model, absorption_first_order, compartment_model
+
+MODELS = {
+    "absorption_first_order": absorption_first_order,
+    "compartment_model": compartment_model,
+    "absorption_chain": absorption_chain_model(4),
+}
+
+# keys of the spec which do not change the results
+EXECUTION_KEYS = {"n_workers"}
+
+
+def load_job(path: Union[Path, str]) -> dict:
+    """Load a job spec from a JSON or TOML file."""
+    path = Path(path)
+    if path.suffix == ".toml":
+        import tomllib  # python >= 3.11
+
+        with open(path, "rb") as f_toml:
+            return tomllib.load(f_toml)
+    with open(path) as f_json:
+        return json.load(f_json)
+
+
+def job_parameters(job: dict) -> dict:
+    """Parameter arrays (n_sets,) of all parameter sets of the job.
+
+    Scanned values are lists or ranges {start, stop, num, log}, fixed
+    parameters are broadcast.
+    """
+    axes = {}
+    for key, values in job.get("scan", {}).items():
+        if isinstance(values, dict):
+            space = np.geomspace if values.get("log", False) else np.linspace
+            values = space(values["start"], values["stop"], values["num"])
+        axes[key] = np.asarray(values, dtype=float)
+    grid = parameter_grid(**axes) if axes else {}
+    n_sets = len(next(iter(grid.values()))) if grid else 1
+
+    params = {
+        key: np.full(n_sets, value, dtype=float)
+        for key, value in job.get("parameters", {}).items()
+    }
+    params.update(grid)
+    return params
+
+
+def job_time(job: dict) -> np.ndarray:
+    """Time points of the job, list or {start, stop, num}."""
+    time = job["time"]
+    if isinstance(time, dict):
+        return np.linspace(time["start"], time["stop"], time["num"])
+    return np.asarray(time, dtype=float)
+
+
+def simulate_shard(job: dict, params: dict, t) -> dict:
+    """Simulate the parameter sets of a shard.
+
+    :return: dict with the parameters, the trajectories of the outputs
+        "x" (n_sets, n_times, n_outputs) and the NCA metrics
+    """
+    model = MODELS[job["model"]]
+    n_sets = len(next(iter(params.values())))
+    missing = set(model.parameters) - set(params)
+    if missing:
+        raise ValueError(f"Missing parameters of model '{job['model']}': {sorted(missing)}")
+    p = np.column_stack([params[key] for key in model.parameters])
+
+    x0 = np.zeros((n_sets, len(model.species)))
+    dose_species = job.get("dose_species", model.species[0])
+    x0[:, model.species.index(dose_species)] = params.get("dose", 0.0)
+
+    method = job.get("method", "linear")
+    if method == "linear":
+        from linear import simulate_linear
+
+        # A = N diag(k) R with the reactant matrix R of first order reactions
+        R = model.rate_jacobian(np.ones(len(model.species)), np.ones(len(model.parameters)))
+        A = np.einsum("ij,pj,jk->pik", model.N, p[:, model.k_index], R)
+        x = simulate_linear(A, x0, t - t[0])
+    elif method == "odeint":
+        x = np.stack([model.simulate(x0[k], t, *p[k]) for k in range(n_sets)])
+    else:
+        raise ValueError(f"Unsupported method: '{method}'")
+
+    outputs = job.get("outputs", model.species)
+    result = dict(params)
+    result["x"] = x[:, :, [model.species.index(sid) for sid in outputs]]
+
+    nca = job.get("nca")
+    if nca:
+        from nca import f_pk_batch
+
+        volume = params.get("volume", 1.0)
+        c = x[:, :, model.species.index(nca["output"])] / np.reshape(volume, (-1, 1))
+        pk = f_pk_batch(
+            t, c, params.get("dose", 0.0),
+            lambda_z=nca.get("lambda_z", "all"),
+            auc_method=nca.get("auc_method", "linear"),
+        )
+        for key in nca.get("metrics", list(pk)):
+            result[f"pk_{key}"] = pk[key]
+    return result
+
+
+def run_job(job: dict, path: Union[Path, str], n_workers: int = None) -> int:
+    """Run a job with checkpoints in the result directory.
+
+    Already completed shards in the result directory are skipped, so an
+    interrupted job is resumed by calling `run_job` again with the same spec.
+
+    :param job: job spec
+    :param path: result directory
+    :param n_workers: number of worker processes (default: spec or number of cpus)
+    :return: number of shards simulated in this call
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    _check_spec(job, path)
+
+    params = job_parameters(job)
+    t = job_time(job)
+    n_sets = len(next(iter(params.values())))
+    shard_size = job.get("shard_size", 1000)
+    shards = [
+        (k, slice(start, min(start + shard_size, n_sets)))
+        for k, start in enumerate(range(0, n_sets, shard_size))
+    ]
+    pending = [(k, s) for k, s in shards if not _shard_path(path, k).exists()]
+
+    n_workers = n_workers or job.get("n_workers") or os.cpu_count() or 1
+    tasks = [
+        (job, {key: values[s] for key, values in params.items()}, t, _shard_path(path, k))
+        for k, s in pending
+    ]
+    if n_workers == 1:
+        for task in tasks:
+            _run_shard(*task)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_run_shard, *task) for task in tasks]
+            for future in as_completed(futures):
+                future.result()
+    return len(pending)
+
+
+def load_results(path: Union[Path, str]) -> dict:
+    """Concatenated results of all completed shards of a result directory.
+
+    :return: dict with "time", the job "spec", parameters and NCA metrics
+        (n_sets,) and the output trajectories "x" (n_sets, n_times, n_outputs)
+    """
+    path = Path(path)
+    with open(path / "job.json") as f_json:
+        job = json.load(f_json)
+    shard_paths = sorted(path.glob("shard_?????.npz"))
+    shards = [dict(np.load(p)) for p in shard_paths]
+    results = {
+        key: np.concatenate([shard[key] for shard in shards]) for key in shards[0]
+    } if shards else {}
+    results["time"] = job_time(job)
+    results["spec"] = job
+    return results
+
+
+def _run_shard(job, params, t, shard_path: Path):
+    """Simulate a shard and write it atomically (picklable for the process pool)."""
+    result = simulate_shard(job, params, t)
+    tmp_path = shard_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f_npz:
+        np.savez(f_npz, **result)
+    os.replace(tmp_path, shard_path)
+
+
+def _shard_path(path: Path, k: int) -> Path:
+    return path / f"shard_{k:05d}.npz"
+
+
+def _check_spec(job: dict, path: Path):
+    """Store the spec, refuse to resume a result directory of a different job.
+
+    Execution-only keys (`EXECUTION_KEYS`) are not part of the hash, so e.g.
+    the number of workers can be changed when resuming.
+    """
+    spec = json.dumps(
+        {key: value for key, value in job.items() if key not in EXECUTION_KEYS},
+        sort_keys=True,
+    )
+    spec_hash = hashlib.sha256(spec.encode()).hexdigest()
+    hash_path = path / "job.sha256"
+    if hash_path.exists():
+        if hash_path.read_text().strip() != spec_hash:
+            raise ValueError(f"Result directory '{path}' belongs to a different job spec.")
+        return
+    (path / "job.json").write_text(json.dumps(job, indent=2))
+    hash_path.write_text(spec_hash)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a declarative simulation job.")
+    parser.add_argument("spec", type=Path, help="job spec (JSON or TOML)")
+    parser.add_argument("path", type=Path, help="result directory")
+    parser.add_argument("--n-workers", type=int, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    n = run_job(load_job(args.spec), args.path, n_workers=args.n_workers)
+    print(f"{n} shards simulated, results in '{args.path}'")
+
+
+if __name__ == "__main__":
+    main()
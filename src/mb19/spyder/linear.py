@@ -0,0 +1,154 @@
+"""
+Closed-form solutions for linear compartment models.
+
+All models in the course (first order absorption, compartment model,
+absorption chain) are linear in the state variables, i.e.
+
+    dx/dt = A x
+
+with the rate matrix A. The solution is x(t) = exp(A t) x0, which can be
+evaluated for many parameter sets at once with batched linear algebra
+instead of integrating every parameter set with odeint.
+"""
+import numpy as np
+
+
+def rate_matrix_absorption_first_order(ka, ke):
+    """Rate matrix of the first order absorption model.
+
+    States: [A_tablet, A_central, A_urine]
+
+    :param ka: absorption rate [1/hr], scalar or array of parameter sets
+    :param ke: elimination rate [1/hr], scalar or array of parameter sets
+    :return: rate matrices (n_params, 3, 3)
+    """
+    ka, ke = np.broadcast_arrays(np.atleast_1d(ka), np.atleast_1d(ke))
+    A = np.zeros((ka.size, 3, 3))
+    A[:, 0, 0] = -ka.ravel()  # va
+    A[:, 1, 0] = ka.ravel()
+    A[:, 1, 1] = -ke.ravel()  # ve
+    A[:, 2, 1] = ke.ravel()
+    return A
+
+
+def rate_matrix_compartment_model(ka, km, ke):
+    """Rate matrix of the compartment model.
+
+    States: [A_tablet, A_central, B_central, A_urine, B_urine]
+
+    :param ka: absorption rate [1/hr]
+    :param km: metabolic rate A -> B [1/hr]
+    :param ke: elimination rate [1/hr]
+    :return: rate matrices (n_params, 5, 5)
+    """
+    ka, km, ke = np.broadcast_arrays(
+        np.atleast_1d(ka), np.atleast_1d(km), np.atleast_1d(ke)
+    )
+    ka, km, ke = ka.ravel(), km.ravel(), ke.ravel()
+    A = np.zeros((ka.size, 5, 5))
+    A[:, 0, 0] = -ka  # va
+    A[:, 1, 0] = ka
+    A[:, 1, 1] = -km - ke  # vm, vuA
+    A[:, 2, 1] = km
+    A[:, 3, 1] = ke
+    A[:, 2, 2] = -ke  # vuB
+    A[:, 4, 2] = ke
+    return A
+
+
+def rate_matrix_absorption_chain(ka, ke):
+    """Rate matrix of the absorption chain model with four transit compartments.
+
+    States: [A_tablet, A_central, A_urine, A1, A2, A3, A4]
+
+    :param ka: absorption and transit rate [1/hr]
+    :param ke: elimination rate [1/hr]
+    :return: rate matrices (n_params, 7, 7)
+    """
+    ka, ke = np.broadcast_arrays(np.atleast_1d(ka), np.atleast_1d(ke))
+    ka, ke = ka.ravel(), ke.ravel()
+    A = np.zeros((ka.size, 7, 7))
+    A[:, 0, 0] = -ka  # va
+    A[:, 3, 0] = ka
+    for k in range(3, 6):  # v1, v2, v3
+        A[:, k, k] = -ka
+        A[:, k + 1, k] = ka
+    A[:, 6, 6] = -ka  # v4
+    A[:, 1, 6] = ka
+    A[:, 1, 1] = -ke  # ve
+    A[:, 2, 1] = ke
+    return A
+
+
+def simulate_linear(A, x0, t, method: str = "auto", cond_max: float = 1e8):
+    """Simulate linear models dx/dt = A x for many parameter sets at once.
+
+    The initial condition x0 is the state at time t = 0.
+
+    :param A: rate matrices (n_params, n_states, n_states) or (n_states, n_states)
+    :param x0: initial conditions (n_states,) or (n_params, n_states)
+    :param t: time points (n_times,)
+    :param method: "eig" (eigendecomposition), "expm" (matrix exponentials) or
+        "auto" (eigendecomposition with expm fallback for parameter sets with
+        (nearly) defective rate matrices, e.g. ka == ke)
+    :param cond_max: maximal condition number of the eigenvector matrix for "auto"
+    :return: solution (n_params, n_times, n_states)
+    """
+    A = np.asarray(A, dtype=float)
+    if A.ndim == 2:
+        A = A[np.newaxis, :, :]
+    n_params, n_states, _ = A.shape
+    x0 = np.broadcast_to(np.asarray(x0, dtype=float), (n_params, n_states))
+    t = np.asarray(t, dtype=float)
+
+    if method not in {"auto", "eig", "expm"}:
+        raise ValueError(f"Unsupported method: '{method}'")
+
+    x = np.empty((n_params, t.size, n_states))
+    if method == "expm":
+        x[:] = _simulate_expm(A, x0, t)
+        return x
+
+    w, V = np.linalg.eig(A)
+    if method == "auto":
+        with np.errstate(divide="ignore", over="ignore"):
+            cond = np.linalg.cond(V)
+        defective = ~(cond < cond_max)
+    else:
+        defective = np.zeros(n_params, dtype=bool)
+
+    regular = ~defective
+    if np.any(regular):
+        x[regular] = _simulate_eig(w[regular], V[regular], x0[regular], t)
+    if np.any(defective):
+        x[defective] = _simulate_expm(A[defective], x0[defective], t)
+
+    return x
+
+
+def _simulate_eig(w, V, x0, t):
+    """Solution via eigendecomposition x(t) = V exp(w t) V^-1 x0."""
+    coeffs = np.linalg.solve(V, x0[:, :, np.newaxis])[:, :, 0]
+    modes = np.exp(w[:, np.newaxis, :] * t[np.newaxis, :, np.newaxis])
+    modes *= coeffs[:, np.newaxis, :]
+    return np.einsum("pij,pkj->pki", V, modes).real
+
+
+def _simulate_expm(A, x0, t):
+    """Solution via propagation with matrix exponentials exp(A dt)."""
+    from scipy import linalg  # imported lazily, only needed for the fallback
+
+    x = np.empty((A.shape[0], t.size, A.shape[1]))
+    propagators = {}
+    xk = x0
+    t_prev = 0.0
+    for k, tk in enumerate(t):
+        dt = tk - t_prev
+        if dt != 0.0:
+            key = round(dt, 12)
+            if key not in propagators:
+                propagators[key] = linalg.expm(A * dt)
+            xk = np.einsum("pij,pj->pi", propagators[key], xk)
+        x[:, k, :] = xk
+        t_prev = tk
+    return x
@@ -0,0 +1,338 @@
+"""
+Content-addressed memoization of simulations.
+
+Identical simulations are re-run constantly when notebooks and scan scripts
+are re-executed. The cache stores simulation results under a hash of
+
+- the model identity: code, defaults and closures of the ODE function or
+  simulate helper, the module-level globals it references (e.g. parameters
+  set in a notebook, called helper functions, recursively) and the state of
+  model objects such as `StoichiometricModel`,
+- parameters, initial state and time grid (array contents, pandas objects
+  by their values and index),
+- solver options such as rtol/atol.
+
+Functions of the standard library and installed packages (numpy, scipy)
+are identified by name and package version. Calls with arguments or
+globals which cannot be hashed by content are not cached (counted as
+`uncached`). Values reached only through attributes of objects which are
+not arguments or globals (e.g. state mutated inside a called library
+function) are not part of the key. Results are kept in an in-memory LRU
+tier bounded by the total size in bytes and optionally in an on-disk tier
+(survives restarts):
+
+    cache = SimulationCache(max_bytes=512 * 2**20, cache_dir=SIMULATION_CACHE_DIR)
+    x = cache.odeint(dxdt_absorption_first_order, x0, t, args=(ka, ke))
+
+    simulate = cache.memoize(simulate_population)
+    x = simulate(dxdt_absorption_first_order, x0, t, args=(ka, ke))  # 10k subjects
+    print(cache.stats)
+
+Arrays are returned as copies, so modifying a result does not modify the cache.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import sysconfig
+import types
+from collections import OrderedDict
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from model_cache import CACHE_DIR
+
+SIMULATION_CACHE_DIR = CACHE_DIR / "simulations"
+
+# installation paths of the standard library and packages
+_LIBRARY_PATHS = tuple(
+    {sysconfig.get_paths()[key] for key in ("stdlib", "platstdlib", "purelib", "platlib")}
+)
+
+
+class SimulationCache:
+    """Memoization cache with in-memory LRU tier and optional disk tier."""
+
+    def __init__(self, max_bytes: int = 256 * 2**20,
+                 cache_dir: Union[Path, str, None] = None):
+        """
+        :param max_bytes: maximal size of the in-memory tier [bytes]
+        :param cache_dir: directory of the disk tier, None for memory only
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0  # calls with arguments which cannot be hashed
+
+    @property
+    def stats(self) -> dict:
+        """Hit/miss statistics and size of the in-memory tier."""
+        n_calls = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / n_calls if n_calls else 0.0,
+            "evictions": self.evictions,
+            "uncached": self.uncached,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+        }
+
+    def memoize(self, func):
+        """Decorator caching the results of a simulate function by its arguments."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = cache_key(func, args, kwargs)
+            except TypeError:
+                self.uncached += 1
+                return func(*args, **kwargs)
+            return self.get_or_compute(key, func, *args, **kwargs)
+        return wrapper
+
+    def odeint(self, func, y0, t, args=(), **kwargs):
+        """Cached `scipy.integrate.odeint` (same signature)."""
+        from scipy.integrate import odeint
+
+        try:
+            key = cache_key(
+                func, (np.asarray(y0, dtype=float), np.asarray(t, dtype=float)),
+                {"args": tuple(args), **kwargs},
+            )
+        except TypeError:
+            self.uncached += 1
+            return odeint(func, y0, t, args=tuple(args), **kwargs)
+        return self.get_or_compute(key, odeint, func, y0, t, args=tuple(args), **kwargs)
+
+    def get_or_compute(self, key: str, func, *args, **kwargs):
+        """Cached result of key, computed with func(*args, **kwargs) on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(self._entries[key][0])
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            if path.exists():
+                with open(path, "rb") as f_pkl:
+                    value = pickle.load(f_pkl)
+                self.disk_hits += 1
+                self._store(key, value)
+                return _copy(value)
+
+        self.misses += 1
+        value = func(*args, **kwargs)
+        self._store(key, _copy(value))
+        if self.cache_dir is not None:
+            self._write(key, value)
+        return value
+
+    def clear(self, disk: bool = False):
+        """Clear the in-memory tier (and the disk tier)."""
+        self._entries.clear()
+        self.nbytes = 0
+        if disk and self.cache_dir is not None:
+            for path in self.cache_dir.glob("*/*.pkl"):
+                path.unlink()
+
+    def _store(self, key: str, value):
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def _write(self, key: str, value):
+        """Write atomically, so concurrent processes never read partial entries."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f_pkl:
+            pickle.dump(value, f_pkl, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+def cache_key(func, args=(), kwargs=None) -> str:
+    """Content hash of a function call (function code, argument values).
+
+    :raises TypeError: if an argument (or a global referenced by the
+        function) cannot be hashed by content
+    """
+    h = hashlib.sha256()
+    seen = set()
+    _update(h, func, seen)
+    _update(h, tuple(args), seen)
+    _update(h, dict(kwargs or {}), seen)
+    return h.hexdigest()
+
+
+def _update(h, obj, seen: set):
+    """Update the hash with the content of obj."""
+    h.update(type(obj).__qualname__.encode())
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(repr(obj).encode())
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        if obj.dtype == object:
+            raise TypeError("Object arrays cannot be hashed by content.")
+        obj = np.ascontiguousarray(obj)
+        h.update(f"{obj.dtype.str}{obj.shape}".encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, (tuple, list)):
+        h.update(str(len(obj)).encode())
+        for item in obj:
+            _update(h, item, seen)
+    elif isinstance(obj, (set, frozenset)):
+        _update(h, sorted(obj, key=repr), seen)
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            _update(h, key, seen)
+            _update(h, obj[key], seen)
+    elif isinstance(obj, functools.partial):
+        _update(h, obj.func, seen)
+        _update(h, obj.args, seen)
+        _update(h, obj.keywords, seen)
+    elif _is_pandas(obj):
+        _update_pandas(h, obj, seen)
+    elif isinstance(obj, types.ModuleType):
+        h.update(obj.__name__.encode())
+    elif id(obj) in seen:
+        # recursive references (e.g. recursive functions) are hashed once
+        h.update(f"<seen {_qualified_name(obj)}>".encode())
+    elif _is_library(obj):
+        # numpy, scipy, builtins: identified by name and package version
+        module = getattr(obj, "__module__", None) or ""
+        package = sys.modules.get(module.partition(".")[0])
+        h.update(f"{_qualified_name(obj)} {getattr(package, '__version__', '')}".encode())
+    elif inspect.ismethod(obj):
+        seen.add(id(obj))
+        _update(h, obj.__func__, seen)
+        _update(h, obj.__self__, seen)
+    elif inspect.isfunction(obj):
+        # model identity: code, defaults, closure contents and referenced globals
+        seen.add(id(obj))
+        h.update(_qualified_name(obj).encode())
+        _update_code(h, obj.__code__, seen)
+        _update(h, obj.__defaults__, seen)
+        _update(h, obj.__kwdefaults__, seen)
+        for cell in obj.__closure__ or ():
+            _update(h, cell.cell_contents, seen)
+        for name in sorted(_global_names(obj.__code__)):
+            if name in obj.__globals__:
+                _update(h, name, seen)
+                _update(h, obj.__globals__[name], seen)
+    elif isinstance(obj, type):
+        # classes: code of the methods
+        seen.add(id(obj))
+        h.update(_qualified_name(obj).encode())
+        for name, value in sorted(vars(obj).items()):
+            if inspect.isfunction(value):
+                _update(h, name, seen)
+                _update(h, value, seen)
+    elif hasattr(obj, "__dict__") and not callable(obj):
+        # model objects: class and all attributes except working buffers
+        # listed in `_memo_exclude` (e.g. cached rate matrices)
+        seen.add(id(obj))
+        _update(h, type(obj), seen)
+        exclude = getattr(obj, "_memo_exclude", ())
+        _update(h, {k: v for k, v in vars(obj).items() if k not in exclude}, seen)
+    else:
+        raise TypeError(f"Cannot hash '{type(obj).__qualname__}' by content for the cache key.")
+
+
+def _update_code(h, code, seen: set):
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            _update_code(h, const, seen)
+        else:
+            _update(h, const, seen)
+    h.update(repr(code.co_names).encode())
+
+
+def _global_names(code) -> set:
+    """Names of globals (and attributes) used by the code and its nested code."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _global_names(const)
+    return names
+
+
+def _qualified_name(obj) -> str:
+    name = getattr(obj, "__qualname__", type(obj).__qualname__)
+    return f"{getattr(obj, '__module__', '')}.{name}"
+
+
+def _is_library(obj) -> bool:
+    """Object of the standard library or an installed package (not model code)."""
+    if isinstance(obj, (types.BuiltinFunctionType, np.ufunc)):
+        return True
+    module = getattr(obj, "__module__", None)
+    if not isinstance(module, str) or not (callable(obj) or isinstance(obj, type)):
+        return False
+    if module in sys.builtin_module_names:
+        return True
+    path = getattr(sys.modules.get(module), "__file__", None)
+    return path is not None and path.startswith(_LIBRARY_PATHS)
+
+
+def _is_pandas(obj) -> bool:
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(obj, (pd.Series, pd.DataFrame, pd.Index))
+
+
+def _update_pandas(h, obj, seen: set):
+    """Hash pandas objects by values, index, columns, name and dtypes."""
+    import pandas as pd
+
+    values = pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index))
+    _update(h, values.to_numpy(), seen)
+    if isinstance(obj, pd.DataFrame):
+        _update(h, [str(c) for c in obj.columns], seen)
+        _update(h, [str(dtype) for dtype in obj.dtypes], seen)
+    else:
+        _update(h, str(obj.name), seen)
+        _update(h, str(obj.dtype), seen)
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return len(pickle.dumps(value))
+
+
+def _copy(value):
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*(_copy(v) for v in value))
+    if isinstance(value, (tuple, list)):
+        return type(value)(_copy(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    return value
+
+
+# default cache, e.g. `x = cache.odeint(dxdt, x0, t, args=(ka, ke))` in notebooks
+cache = SimulationCache()
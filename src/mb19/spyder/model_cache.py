@@ -0,0 +1,125 @@
+"""
+On-disk cache for compiled roadrunner models.
+
+Loading an SBML model with roadrunner parses and JIT compiles the model in
+every session, and flattening a comp model (e.g. `caffeine_body.xml` with the
+`caffeine_liver.xml` and `caffeine_kidney.xml` submodels) is even slower.
+The cache stores the flattened SBML and the serialized roadrunner state
+under a hash of the content of all model files and the options. Changing
+any of the files (including submodels) results in a new hash, so outdated
+cache entries are never used.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import List, Union
+
+CACHE_DIR = Path(os.environ.get("MB19_CACHE_DIR", Path.home() / ".cache" / "mb19"))
+
+# submodels referenced via the SBML comp package
+_EXTERNAL_MODEL_PATTERN = re.compile(
+    r"<comp:externalModelDefinition\b[^>]*?\bcomp:source=\"([^\"]+)\""
+)
+
+
+def sbml_dependencies(sbml_path: Path) -> List[Path]:
+    """Model file and all external model definitions (recursively)."""
+    sbml_path = Path(sbml_path).resolve()
+    paths = [sbml_path]
+    for path in paths:
+        for source in _EXTERNAL_MODEL_PATTERN.findall(path.read_text(encoding="utf-8")):
+            if source.startswith("file:"):
+                source = source[len("file:"):]
+            dependency = (path.parent / source).resolve()
+            if dependency not in paths:
+                paths.append(dependency)
+    return paths
+
+
+def content_hash(paths: List[Path], **options) -> str:
+    """SHA256 hash of the content of the files and the options."""
+    h = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        h.update(path.name.encode("utf-8"))
+        h.update(path.read_bytes())
+    h.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_model(sbml_path: Path, flatten: bool = False,
+               cache_dir: Path = CACHE_DIR):
+    """Load roadrunner model from the cache or create the cache entry.
+
+    :param sbml_path: path to the SBML model
+    :param flatten: flatten the comp model with sbmlutils before loading
+    :param cache_dir: directory of the cache
+    :return: roadrunner.RoadRunner
+    """
+    import roadrunner
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = content_hash(
+        sbml_dependencies(sbml_path),
+        flatten=flatten,
+        roadrunner=roadrunner.__version__,
+    )
+    state_path = cache_dir / f"{key}.rr"
+
+    if state_path.exists():
+        r = roadrunner.RoadRunner()
+        r.loadState(str(state_path))
+        return r
+
+    if flatten:
+        sbml_path = flat_sbml_path(sbml_path, cache_dir=cache_dir)
+    r = roadrunner.RoadRunner(str(sbml_path))
+
+    tmp_path = state_path.with_suffix(f".{os.getpid()}.tmp")
+    r.saveState(str(tmp_path))
+    os.replace(tmp_path, state_path)
+    return r
+
+
+def flat_sbml_path(sbml_path: Path, cache_dir: Path = CACHE_DIR) -> Path:
+    """Path to the flattened SBML of a comp model, flattened only once."""
+    from sbmlutils.comp import flatten_sbml
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = content_hash(sbml_dependencies(sbml_path), flatten=True)
+    flat_path = cache_dir / f"{Path(sbml_path).stem}_{key}_flat.xml"
+    if not flat_path.exists():
+        tmp_path = flat_path.with_suffix(f".{os.getpid()}.tmp")
+        flatten_sbml(Path(sbml_path), sbml_flat_path=tmp_path)
+        os.replace(tmp_path, flat_path)
+    return flat_path
+
+
+def create_model_cached(model, filepath: Union[Path, str], **kwargs) -> Path:
+    """Create SBML with the sbmlutils factory only if the model changed.
+
+    The hash of the model definition is stored next to the SBML file
+    (`<filepath>.sha256`).
+
+    :param model: sbmlutils.factory.Model
+    :param filepath: path of the SBML file
+    :param kwargs: additional arguments of sbmlutils.factory.create_model
+    :return: path of the SBML file
+    """
+    from sbmlutils.factory import create_model
+
+    filepath = Path(filepath)
+    hash_path = filepath.with_name(f"{filepath.name}.sha256")
+    key = hashlib.sha256(
+        pickle.dumps(model, protocol=4) + repr(sorted(kwargs.items())).encode("utf-8")
+    ).hexdigest()
+    if filepath.exists() and hash_path.exists() and hash_path.read_text() == key:
+        return filepath
+
+    create_model(model=model, filepath=filepath, **kwargs)
+    hash_path.write_text(key)
+    return filepath
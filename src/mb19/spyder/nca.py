@@ -0,0 +1,190 @@
+"""
+Non-compartmental analysis (NCA) for many concentration curves at once.
+
+Vectorized version of `helpers.f_pk`. All profiles are processed with
+array operations instead of calling `f_pk` for every subject. Missing values
+(NaN) are masked per profile. Results are returned as columnar table
+(dict of arrays), units are stored once in `PK_UNITS`.
+
+The terminal phase (lambda_z) is either fitted on all points after Cmax
+(as `f_pk`) or selected automatically by best adjusted R^2. All candidate
+tail windows of all profiles are evaluated at once using cumulative sums.
+"""
+import numpy as np
+
+PK_UNITS = {
+    "dose": "mg",
+    "auc": "mg/l*hr",
+    "aucinf": "mg/l*hr",
+    "tmax": "hr",
+    "cmax": "mg/l",
+    "thalf": "hr",
+    "kel": "1/hr",
+    "vd": "l",
+    "cl": "l/hr",
+    "r2_adj": "-",
+    "n_terminal": "-",
+}
+
+# candidates within this tolerance of the best adjusted R^2 are considered
+# equal, the candidate with most points is selected
+R2_ADJ_TOLERANCE = 1e-4
+
+
+def f_pk_batch(t, c, dose, lambda_z: str = "all", auc_method: str = "linear"):
+    """Calculate PK information for multiple concentration curves.
+
+    :param t: time points (n_times,) or (n_profiles, n_times) [hr]
+    :param c: concentrations (n_profiles, n_times) [mg/l], NaN for missing values
+    :param dose: dose (scalar or (n_profiles,)) [mg]
+    :param lambda_z: terminal phase selection, "all" (all points after Cmax) or
+        "best" (tail window with best adjusted R^2 and at least 3 points)
+    :param auc_method: "linear" (linear trapezoids) or "linear-up/log-down"
+        (logarithmic trapezoids for decreasing concentrations)
+    :return: dict of arrays (n_profiles,) with keys of PK_UNITS
+    """
+    if lambda_z not in {"all", "best"}:
+        raise ValueError(f"Unsupported lambda_z selection: '{lambda_z}'")
+    if auc_method not in {"linear", "linear-up/log-down"}:
+        raise ValueError(f"Unsupported AUC method: '{auc_method}'")
+
+    c = np.atleast_2d(np.asarray(c, dtype=float))
+    n_profiles, n_times = c.shape
+    t = np.broadcast_to(np.asarray(t, dtype=float), (n_profiles, n_times))
+    dose = np.broadcast_to(np.asarray(dose, dtype=float), (n_profiles,))
+    rows = np.arange(n_profiles)
+
+    valid = ~np.isnan(t) & ~np.isnan(c)
+    auc = _auc(t, c, valid, log_down=(auc_method == "linear-up/log-down"))
+
+    idx = np.argmax(np.where(valid, c, -np.inf), axis=1)
+    tmax, cmax = t[rows, idx], c[rows, idx]
+
+    # log-linear regression on the terminal phase (after the maximum)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.log(c)
+    terminal = valid & np.isfinite(y) & (np.arange(n_times) > idx[:, np.newaxis])
+    if lambda_z == "best":
+        slope, r2_adj, n_terminal = _best_fit_slope(t - tmax[:, np.newaxis], y, terminal)
+    else:
+        slope, r2_adj, n_terminal = _regression_slope(t, y, terminal)
+
+    kel = -slope
+    with np.errstate(divide="ignore", invalid="ignore"):
+        thalf = np.log(2) / kel
+        c_last = c[rows, _last_index(valid)]
+        auc_delta = -c_last / slope
+        aucinf = auc + auc_delta
+        vd = dose / (aucinf * kel)
+    cl = kel * vd
+
+    return {
+        "dose": np.array(dose),
+        "auc": auc,
+        "aucinf": aucinf,
+        "tmax": tmax,
+        "cmax": cmax,
+        "thalf": thalf,
+        "kel": kel,
+        "vd": vd,
+        "cl": cl,
+        "r2_adj": r2_adj,
+        "n_terminal": n_terminal,
+    }
+
+
+def _previous_index(valid):
+    """Index of the previous valid point for every point (-1 if none)."""
+    n_times = valid.shape[1]
+    idx = np.where(valid, np.arange(n_times), -1)
+    previous = np.maximum.accumulate(idx, axis=1)
+    previous[:, 1:] = previous[:, :-1].copy()
+    previous[:, 0] = -1
+    return previous
+
+
+def _last_index(valid):
+    """Index of the last valid point per profile."""
+    n_times = valid.shape[1]
+    return n_times - 1 - np.argmax(valid[:, ::-1], axis=1)
+
+
+def _auc(t, c, valid, log_down: bool = False):
+    """AUC with trapezoids between consecutive valid points."""
+    previous = _previous_index(valid)
+    has_previous = valid & (previous >= 0)
+    p = np.maximum(previous, 0)
+    t_prev = np.take_along_axis(t, p, axis=1)
+    c_prev = np.take_along_axis(c, p, axis=1)
+    segments = (t - t_prev) * (c + c_prev) / 2.0
+    if log_down:
+        down = has_previous & (c < c_prev) & (c > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_segments = (t - t_prev) * (c_prev - c) / np.log(c_prev / c)
+        segments = np.where(down, log_segments, segments)
+    return np.where(has_previous, segments, 0.0).sum(axis=1)
+
+
+def _regression_slope(x, y, mask):
+    """Least squares fit y = a + b*x on the masked points per row.
+
+    :return: slope, adjusted R^2, number of points
+    """
+    n = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.where(mask, x, 0.0).sum(axis=1) / n
+        y_mean = np.where(mask, y, 0.0).sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, np.newaxis], 0.0)
+        dy = np.where(mask, y - y_mean[:, np.newaxis], 0.0)
+        sxx, syy, sxy = (dx * dx).sum(axis=1), (dy * dy).sum(axis=1), (dx * dy).sum(axis=1)
+        slope = sxy / sxx
+        r2_adj = _r2_adjusted(sxy * sxy / (sxx * syy), n)
+    return np.where(n >= 2, slope, np.nan), r2_adj, n
+
+
+def _best_fit_slope(x, y, mask):
+    """Log-linear fit on the tail window with the best adjusted R^2.
+
+    Every window consists of the last masked points of a row starting at a
+    masked point. Regression sums of all windows are reverse cumulative sums,
+    so all candidates are evaluated with O(n_times) array operations.
+
+    :return: slope, adjusted R^2, number of points
+    """
+    xm = np.where(mask, x, 0.0)
+    ym = np.where(mask, y, 0.0)
+
+    def tail_sum(a):
+        return np.cumsum(a[:, ::-1], axis=1)[:, ::-1]
+
+    n = tail_sum(mask.astype(float))
+    sx, sy = tail_sum(xm), tail_sum(ym)
+    sxx, syy, sxy = tail_sum(xm * xm), tail_sum(ym * ym), tail_sum(xm * ym)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vxx = n * sxx - sx * sx
+        vyy = n * syy - sy * sy
+        vxy = n * sxy - sx * sy
+        slope = vxy / vxx
+        r2_adj = _r2_adjusted(vxy * vxy / (vxx * vyy), n)
+
+    candidates = mask & (n >= 3) & (slope < 0) & np.isfinite(r2_adj)
+    r2_adj = np.where(candidates, r2_adj, -np.inf)
+    r2_best = r2_adj.max(axis=1)
+
+    # longest window within the tolerance of the best adjusted R^2
+    selected = candidates & (r2_adj >= r2_best[:, np.newaxis] - R2_ADJ_TOLERANCE)
+    j = np.argmax(selected, axis=1)
+    found = selected.any(axis=1)
+    rows = np.arange(mask.shape[0])
+    return (
+        np.where(found, slope[rows, j], np.nan),
+        np.where(found, r2_adj[rows, j], np.nan),
+        np.where(found, n[rows, j], 0).astype(int),
+    )
+
+
+def _r2_adjusted(r2, n):
+    """Adjusted coefficient of determination for a linear fit with n points."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 1.0 - (1.0 - np.minimum(r2, 1.0)) * (n - 1) / (n - 2)
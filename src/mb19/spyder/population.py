@@ -0,0 +1,57 @@
+"""
+Population simulations with a single solver call.
+
+Instead of calling odeint once per virtual subject, the states of all
+subjects are stacked into one state vector and integrated together. The
+ODE functions of the course (e.g. `dxdt_absorption_first_order`) only use
+elementwise arithmetic, so they can be evaluated for all subjects at once
+with states of shape (n_states, n_subjects) and per-subject parameter arrays.
+"""
+import numpy as np
+from scipy.integrate import odeint
+
+
+def simulate_population(dxdt, x0, t, args=(), chunk_size: int = 10000, **kwargs):
+    """Simulate a population of subjects with stacked states.
+
+    States are stored subject by subject, so the Jacobian of the stacked
+    system is block diagonal and odeint uses a banded Jacobian.
+
+    :param dxdt: ODE function dxdt(x, t, *args) evaluated with states of shape
+        (n_states, n_subjects) and parameters of shape (n_subjects,)
+    :param x0: initial condition (n_states,) or (n_subjects, n_states)
+    :param t: time points (n_times,)
+    :param args: parameters, scalars or arrays (n_subjects,)
+    :param chunk_size: maximal number of subjects per solver call, bounds memory
+    :param kwargs: additional arguments passed to odeint (e.g. rtol, atol)
+    :return: solution (n_subjects, n_times, n_states)
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    args = [np.asarray(a, dtype=float) for a in args]
+    n_subjects = max([x0.shape[0]] + [a.size for a in args if a.ndim > 0])
+    n_states = x0.shape[1]
+    x0 = np.broadcast_to(x0, (n_subjects, n_states))
+    args = [np.broadcast_to(a, (n_subjects,)) for a in args]
+    t = np.asarray(t, dtype=float)
+
+    x = np.empty((n_subjects, t.size, n_states))
+    for start in range(0, n_subjects, chunk_size):
+        end = min(start + chunk_size, n_subjects)
+        chunk_args = tuple(a[start:end] for a in args)
+        y = odeint(
+            _stacked_dxdt, x0[start:end].ravel(), t,
+            args=(dxdt, end - start, n_states, chunk_args),
+            ml=n_states - 1, mu=n_states - 1,
+            **kwargs
+        )
+        x[start:end] = y.reshape(t.size, end - start, n_states).transpose(1, 0, 2)
+
+    return x
+
+
+def _stacked_dxdt(y, t, dxdt, n_subjects, n_states, args):
+    """ODE function of the stacked population system."""
+    x = y.reshape(n_subjects, n_states).T
+    dx = np.empty((n_subjects, n_states))
+    dx.T[:] = np.broadcast_arrays(*dxdt(x, t, *args), np.empty(n_subjects))[:-1]
+    return dx.ravel()
@@ -0,0 +1,97 @@
+"""
+Dosing regimens within the therapeutic window.
+
+Searches dose amount and dosing interval so that the steady state
+concentrations stay between the minimal effective concentration (MEC) and
+the minimal toxic concentration (MTC). For linear models the steady state
+profile is proportional to the dose, so only one steady state per dosing
+interval is calculated (batched over all intervals) and scaled to all doses
+of the grid.
+"""
+import numpy as np
+
+from steady_state import steady_state_linear
+
+
+def optimize_regimen(A, mec: float, mtc: float, doses, taus, dose_index: int = 0,
+                     output: int = 1, volume: float = 1.0, n_points: int = 200,
+                     tol: float = 1e-3):
+    """Evaluate a grid of regimens and refine the maximal dosing interval.
+
+    :param A: rate matrix of the model (n_states, n_states)
+    :param mec: minimal effective concentration
+    :param mtc: minimal toxic concentration
+    :param doses: doses of the grid (n_doses,) [mg]
+    :param taus: dosing intervals of the grid (n_taus,) [hr]
+    :param dose_index: index of the dosed state (e.g. A_tablet)
+    :param output: index of the output state (e.g. A_central)
+    :param volume: volume to convert the output amount in a concentration
+    :param n_points: time points per dosing interval
+    :param tol: tolerance of the bisection for the maximal dosing interval [hr]
+    :return: dict with
+        trough, peak (n_taus, n_doses): steady state concentrations
+        fraction (n_taus, n_doses): time fraction within the window at steady state
+        feasible (n_taus, n_doses): trough >= MEC and peak <= MTC
+        dose_min, dose_max (n_taus,): feasible dose range (NaN if none)
+        tau_max: largest feasible dosing interval in the range of taus (NaN if none)
+        dose_tau_max: dose for tau_max
+    """
+    A = np.asarray(A, dtype=float)
+    doses = np.asarray(doses, dtype=float)
+    taus = np.asarray(taus, dtype=float)
+
+    # unit dose steady states for all dosing intervals
+    ss = steady_state_linear(
+        np.broadcast_to(A, (taus.size,) + A.shape), taus, 1.0,
+        dose_index=dose_index, output=output, volume=volume, n_points=n_points,
+    )
+    trough = ss["trough"][:, np.newaxis] * doses
+    peak = ss["peak"][:, np.newaxis] * doses
+    c = ss["profile"][:, np.newaxis, :-1] * doses[np.newaxis, :, np.newaxis]
+    fraction = np.mean((c >= mec) & (c <= mtc), axis=2)
+    feasible = (trough >= mec) & (peak <= mtc)
+
+    # exact dose range due to linearity in the dose
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dose_min = mec / ss["trough"]
+        dose_max = mtc / ss["peak"]
+    window = dose_min <= dose_max
+    dose_min = np.where(window, dose_min, np.nan)
+    dose_max = np.where(window, dose_max, np.nan)
+
+    # bisection on the largest feasible dosing interval
+    tau_max, dose_tau_max = np.nan, np.nan
+    if np.any(window):
+        k = np.flatnonzero(window)[-1]
+        lower, upper = taus[k], taus[k + 1] if k + 1 < taus.size else None
+        if upper is not None:
+            while upper - lower > tol:
+                tau = 0.5 * (lower + upper)
+                if _window_ratio(A, tau, dose_index, output, n_points) <= mtc / mec:
+                    lower = tau
+                else:
+                    upper = tau
+        tau_max = lower
+        ss_max = steady_state_linear(
+            A, tau_max, 1.0, dose_index=dose_index, output=output, volume=volume,
+            n_points=n_points
+        )
+        dose_tau_max = mec / ss_max["trough"][0]
+
+    return {
+        "trough": trough,
+        "peak": peak,
+        "fraction": fraction,
+        "feasible": feasible,
+        "dose_min": dose_min,
+        "dose_max": dose_max,
+        "tau_max": tau_max,
+        "dose_tau_max": dose_tau_max,
+    }
+
+
+def _window_ratio(A, tau, dose_index, output, n_points):
+    """Peak to trough ratio at steady state, independent of the dose."""
+    ss = steady_state_linear(A, tau, 1.0, dose_index=dose_index, output=output,
+                             n_points=n_points)
+    return ss["peak"][0] / ss["trough"][0]
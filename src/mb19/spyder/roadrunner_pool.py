@@ -0,0 +1,107 @@
+"""
+Pool of worker processes with a loaded roadrunner model.
+
+Loading and JIT compiling an SBML model (e.g. `caffeine_body_flat.xml` of
+the PBPK tutorial) takes longer than a single simulation. Every worker
+process of the pool loads the model once and afterwards only resets the
+model, applies the parameter changes and simulates. Only the selected
+columns are sent back to the main process.
+
+Example (PBPK tutorial)::
+
+    with RoadRunnerPool("caffeine_body_flat.xml") as pool:
+        overrides = [{"init(PODOSE_caf)": 100, "BW": bw} for bw in bodyweights]
+        s = pool.simulate(overrides, start=0, end=24*60, steps=500)
+    # s[k, :, 1] is Mve_caf of bodyweights[k]
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# state of the worker processes
+_worker = {}
+
+
+class RoadRunnerPool:
+    """Pool of long-lived worker processes with a loaded roadrunner model."""
+
+    def __init__(self, sbml_path: Path, n_workers: int = None,
+                 selections=("time", "Mve_caf", "Mve_px"),
+                 reset: str = "resetToOrigin"):
+        """Start the worker processes and load the model in every worker.
+
+        :param sbml_path: path to the SBML model
+        :param n_workers: number of worker processes (default: number of cpus)
+        :param selections: columns of the simulation results
+        :param reset: roadrunner method called before every simulation
+            ("resetToOrigin", "resetAll" or "reset")
+        """
+        self.selections = list(selections)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_init_worker,
+            initargs=(str(sbml_path), self.selections, reset),
+        )
+
+    def simulate(self, overrides: List[Dict[str, float]], start: float = 0,
+                 end: float = 10, steps: int = 200, batch_size: int = None) -> np.ndarray:
+        """Simulate the model for all parameter overrides.
+
+        :param overrides: list of changes per simulation, e.g. {"BW": 75}
+        :param start: start time
+        :param end: end time
+        :param steps: simulation steps
+        :param batch_size: number of simulations per task
+        :return: results (n_simulations, steps + 1, n_selections)
+        """
+        n = len(overrides)
+        if batch_size is None:
+            batch_size = max(1, int(np.ceil(n / (4 * self.n_workers))))
+        futures = [
+            self.executor.submit(
+                _simulate_batch, overrides[k:k + batch_size], start, end, steps
+            )
+            for k in range(0, n, batch_size)
+        ]
+        results = np.empty((n, steps + 1, len(self.selections)))
+        for k, future in zip(range(0, n, batch_size), futures):
+            s = future.result()
+            results[k:k + len(s)] = s
+        return results
+
+    def close(self):
+        """Shut down the worker processes."""
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _init_worker(sbml_path: str, selections: List[str], reset: str):
+    """Load and compile the model once per worker process."""
+    import roadrunner
+
+    r = roadrunner.RoadRunner(sbml_path)
+    r.timeCourseSelections = selections
+    _worker["r"] = r
+    _worker["reset"] = getattr(r, reset)
+
+
+def _simulate_batch(overrides: List[Dict[str, float]], start: float, end: float,
+                    steps: int) -> np.ndarray:
+    """Simulate a batch of parameter overrides in a worker process."""
+    r = _worker["r"]
+    results = np.empty((len(overrides), steps + 1, len(r.timeCourseSelections)))
+    for k, changes in enumerate(overrides):
+        _worker["reset"]()
+        for key, value in changes.items():
+            r[key] = value
+        results[k] = r.simulate(start=start, end=end, steps=steps)
+    return results
@@ -0,0 +1,108 @@
+"""
+Parallel parameter scans.
+
+The points of a parameter grid are distributed in chunks over a pool of
+worker processes. Every worker writes its results directly into a result
+array in shared memory, so no trajectories are pickled between the
+processes and the order of the results is the order of the grid.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# state of the worker processes
+_worker = {}
+
+
+def parameter_grid(**axes):
+    """Full factorial grid of the given parameter values.
+
+    >>> parameter_grid(ka=[1, 2], ke=[0.5, 1.0])
+    {'ka': array([1, 1, 2, 2]), 'ke': array([0.5, 1. , 0.5, 1. ])}
+
+    :return: dict of parameter arrays (n_points,)
+    """
+    names = list(axes)
+    values = list(itertools.product(*(np.asarray(axes[name]) for name in names)))
+    return {
+        name: np.array([v[k] for v in values])
+        for k, name in enumerate(names)
+    }
+
+
+def scan(simulate, grid, shape, n_workers: int = None, chunk_size: int = None,
+         dtype=np.float64):
+    """Run simulate for all points of the parameter grid.
+
+    `simulate(**params)` must return an array of the given shape (e.g. a
+    trajectory (n_times, n_states) or a vector of outputs) and must be
+    picklable, i.e. defined at module level.
+
+    :param simulate: function simulate(**params) -> array of shape `shape`
+    :param grid: dict of parameter arrays (n_points,), see `parameter_grid`
+    :param shape: shape of a single simulation result
+    :param n_workers: number of worker processes (default: number of cpus);
+        1 runs the scan in the current process
+    :param chunk_size: number of grid points per task
+    :param dtype: dtype of the results
+    :return: results (n_points, *shape)
+    """
+    grid = {key: np.asarray(values) for key, values in grid.items()}
+    n_points = len(next(iter(grid.values()))) if grid else 0
+    shape = (n_points,) + tuple(np.atleast_1d(shape))
+    n_workers = n_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(n_points / (4 * n_workers))))
+
+    if n_workers == 1 or n_points == 0:
+        results = np.empty(shape, dtype=dtype)
+        if n_points:
+            _run_chunk(simulate, results, 0, grid)
+        return results
+
+    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(shm.name, shape, dtype, simulate),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_task, start, {key: v[start:start + chunk_size] for key, v in grid.items()}
+                )
+                for start in range(0, n_points, chunk_size)
+            ]
+            for future in futures:
+                future.result()
+
+        results = np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return results
+
+
+def _init_worker(name, shape, dtype, simulate):
+    """Attach the worker process to the shared result array."""
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    _worker["results"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker["simulate"] = simulate
+
+
+def _run_task(start, params):
+    """Simulate a chunk of the grid in a worker process."""
+    _run_chunk(_worker["simulate"], _worker["results"], start, params)
+
+
+def _run_chunk(simulate, results, start, params):
+    """Write the results of the chunk params into results[start:]."""
+    n = len(next(iter(params.values())))
+    for k in range(n):
+        results[start + k] = simulate(**{key: values[k] for key, values in params.items()})
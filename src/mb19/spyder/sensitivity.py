@@ -0,0 +1,91 @@
+"""
+Forward sensitivity analysis.
+
+The state sensitivities S = dx/dp fulfill the sensitivity equations
+
+    dS/dt = J(x, p) S + df/dp(x, p),   S(0) = 0
+
+with the Jacobian J = df/dx. They are integrated together with the model
+in one augmented system, which replaces the re-simulation of parameter
+scans for parameter influence and provides exact gradients for fitting.
+The models are defined with `stoichiometry.StoichiometricModel`, which
+provides the analytical Jacobian and parameter Jacobian.
+"""
+import numpy as np
+from scipy.integrate import odeint, trapezoid
+
+
+def simulate_sensitivities(model, x0, t, *p, **kwargs):
+    """Simulate the model together with the forward sensitivities.
+
+    :param model: StoichiometricModel
+    :param x0: initial condition
+    :param t: time points
+    :param p: parameter values in the order of `model.parameters`
+    :param kwargs: additional arguments passed to odeint
+    :return: x (n_times, n_species), S = dx/dp (n_times, n_species, n_parameters)
+    """
+    n_s, n_p = len(model.species), len(model.parameters)
+    y0 = np.zeros(n_s * (n_p + 1))
+    y0[:n_s] = x0
+    y = odeint(_dxdt_sensitivities, y0, t, args=(model, n_s, n_p, p), **kwargs)
+    return y[:, :n_s], y[:, n_s:].reshape(-1, n_s, n_p)
+
+
+def _dxdt_sensitivities(y, t, model, n_s, n_p, p):
+    """ODE function of the model augmented with the sensitivity equations."""
+    x = y[:n_s]
+    S = y[n_s:].reshape(n_s, n_p)
+    dydt = np.empty_like(y)
+    dydt[:n_s] = model.dxdt(x, t, *p)
+    dydt[n_s:] = (model.jacobian(x, t, *p) @ S + model.parameter_jacobian(x, t, *p)).ravel()
+    return dydt
+
+
+def clearance_volume_sensitivities(x, S, ke_index: int, CL: float, V: float,
+                                   output: int = 1):
+    """Sensitivities of the concentration for the parametrization ke = CL/V.
+
+    The output concentration is c = x[:, output]/V.
+
+    :param x: solution (n_times, n_species)
+    :param S: sensitivities dx/dp (n_times, n_species, n_parameters)
+    :param ke_index: index of ke in the parameters
+    :param CL: clearance [l/hr]
+    :param V: volume [l]
+    :param output: index of the output species
+    :return: c (n_times,), dc/dCL (n_times,), dc/dV (n_times,)
+    """
+    A = x[:, output]
+    dA_dke = S[:, output, ke_index]
+    c = A / V
+    dc_dCL = dA_dke / V / V
+    dc_dV = -dA_dke * CL / V ** 3 - A / V ** 2
+    return c, dc_dCL, dc_dV
+
+
+def pk_sensitivities(t, c, dc_dp, p):
+    """Sensitivities of AUC and Cmax.
+
+    Normalized sensitivity coefficients are (dY/dp) * p / Y.
+
+    :param t: time points (n_times,)
+    :param c: output (n_times,)
+    :param dc_dp: output sensitivities (n_times, n_parameters)
+    :param p: parameter values (n_parameters,)
+    :return: dict with auc, cmax, their derivatives and normalized coefficients
+    """
+    p = np.asarray(p, dtype=float)
+    auc = trapezoid(c, t)
+    dauc_dp = trapezoid(dc_dp, t, axis=0)
+    idx = np.argmax(c)
+    cmax = c[idx]
+    dcmax_dp = dc_dp[idx]
+    return {
+        "auc": auc,
+        "cmax": cmax,
+        "dauc_dp": dauc_dp,
+        "dcmax_dp": dcmax_dp,
+        "auc_normalized": dauc_dp * p / auc,
+        "cmax_normalized": dcmax_dp * p / cmax,
+    }
@@ -0,0 +1,126 @@
+"""
+Global sensitivity analysis with Sobol indices.
+
+First and total order Sobol indices quantify which parameters drive the
+variance of PK outputs (e.g. Cmax, AUC) in a population. The Saltelli
+sampling scheme requires N (k + 2) model evaluations for k parameters,
+so the model is evaluated with all samples at once by a batched
+simulator, e.g.
+
+    def evaluate(ka, ke):
+        x = simulate_first_order_absorption(dose, ka, ke, t)
+        pk = f_pk_batch(t, x[:, :, 1], dose)
+        return np.column_stack([pk["cmax"], pk["auc"]])
+
+or a `RoadRunnerPool` for the PBPK model.
+
+Estimators: first order (Saltelli 2010), total order (Jansen 1999),
+confidence intervals by bootstrap.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy.stats import qmc
+
+# maximal number of elements of the bootstrap temporaries (k, chunk, n, n_outputs)
+BOOTSTRAP_ELEMENTS = 2**22
+
+
+def saltelli_samples(bounds: Dict[str, Tuple[float, float]], n: int,
+                     log: bool = False, seed=None):
+    """Saltelli sample matrices [A; B; AB_1; ...; AB_k].
+
+    AB_i is A with column i taken from B.
+
+    :param bounds: parameter bounds {name: (lower, upper)}
+    :param n: base sample size N (power of 2 for balanced Sobol sequences)
+    :param log: sample uniformly on logarithmic scale
+    :param seed: seed of the scrambled Sobol sequence
+    :return: samples (n * (k + 2), k)
+    """
+    k = len(bounds)
+    lower = np.array([b[0] for b in bounds.values()], dtype=float)
+    upper = np.array([b[1] for b in bounds.values()], dtype=float)
+    if log:
+        lower, upper = np.log(lower), np.log(upper)
+
+    base = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random(n)
+    A = lower + base[:, :k] * (upper - lower)
+    B = lower + base[:, k:] * (upper - lower)
+    AB = np.repeat(A[np.newaxis, :, :], k, axis=0)
+    for i in range(k):
+        AB[i, :, i] = B[:, i]
+
+    X = np.concatenate([A, B, AB.reshape(k * n, k)])
+    return np.exp(X) if log else X
+
+
+def sobol_indices(Y, n: int, k: int, n_bootstrap: int = 1000,
+                  confidence: float = 0.95, seed=None):
+    """First and total order Sobol indices from the outputs of Saltelli samples.
+
+    :param Y: outputs (n * (k + 2),) or (n * (k + 2), n_outputs)
+    :param n: base sample size N
+    :param k: number of parameters
+    :param n_bootstrap: number of bootstrap resamples for the confidence intervals
+    :param confidence: confidence level
+    :param seed: seed for the bootstrap
+    :return: dict with S1, ST (k, n_outputs) and their confidence intervals
+        S1_conf, ST_conf (2, k, n_outputs)
+    """
+    Y = np.asarray(Y, dtype=float)
+    Y = Y.reshape(n * (k + 2), -1)
+    fA = Y[:n]
+    fB = Y[n:2 * n]
+    fAB = Y[2 * n:].reshape(k, n, -1)
+
+    S1, ST = _estimate(fA, fB, fAB)
+
+    # bootstrap in chunks of resamples, temporaries are bounded by
+    # BOOTSTRAP_ELEMENTS instead of (k, n_bootstrap, n, n_outputs)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_ELEMENTS // (k * n * Y.shape[1]))
+    S1_boot = np.empty((k, n_bootstrap, Y.shape[1]))
+    ST_boot = np.empty((k, n_bootstrap, Y.shape[1]))
+    for start in range(0, n_bootstrap, chunk):
+        end = min(start + chunk, n_bootstrap)
+        idx = rng.integers(0, n, size=(end - start, n))
+        S1_boot[:, start:end], ST_boot[:, start:end] = _estimate(
+            fA[idx], fB[idx], fAB[:, idx]
+        )
+    q = [(1 - confidence) / 2, (1 + confidence) / 2]
+
+    return {
+        "S1": S1,
+        "ST": ST,
+        "S1_conf": np.quantile(S1_boot, q, axis=1),
+        "ST_conf": np.quantile(ST_boot, q, axis=1),
+    }
+
+
+def sobol_analysis(evaluate, bounds: Dict[str, Tuple[float, float]], n: int,
+                   log: bool = False, seed=None, **kwargs):
+    """Sobol analysis with a batched model evaluation.
+
+    :param evaluate: function evaluate(**params) -> outputs (n_samples,) or
+        (n_samples, n_outputs) with parameter arrays (n_samples,)
+    :param bounds: parameter bounds {name: (lower, upper)}
+    :param n: base sample size N
+    :param log: sample uniformly on logarithmic scale
+    :param seed: random seed
+    :param kwargs: arguments of `sobol_indices`
+    :return: dict of `sobol_indices` with additional parameter names
+    """
+    X = saltelli_samples(bounds, n, log=log, seed=seed)
+    Y = evaluate(**{name: X[:, i] for i, name in enumerate(bounds)})
+    indices = sobol_indices(Y, n, len(bounds), seed=seed, **kwargs)
+    indices["parameters"] = list(bounds)
+    return indices
+
+
+def _estimate(fA, fB, fAB):
+    """Sobol estimators along the sample axis (second to last axis of fA)."""
+    var = np.var(np.concatenate([fA, fB], axis=-2), axis=-2)
+    S1 = np.mean(fB * (fAB - fA), axis=-2) / var
+    ST = 0.5 * np.mean((fA - fAB) ** 2, axis=-2) / var
+    return S1, ST
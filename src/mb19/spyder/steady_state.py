@@ -0,0 +1,211 @@
+"""
+Steady state of periodic dosing regimens.
+
+Instead of simulating many doses until the concentration curve settles,
+the periodic steady state is calculated directly:
+
+- linear models: the state after a dose x_ss fulfills x_ss = Phi x_ss + b
+  with the one-period propagator Phi = exp(A tau) and the dose vector b,
+  i.e. x_ss = (I - Phi)^-1 b (accumulation).
+- nonlinear models: the fixed point of the period map (integrate one
+  dosing interval and add the dose) is found by shooting with a
+  Newton-type root finder.
+
+Accumulating states without influence on the dynamics (e.g. A_urine) have
+no periodic steady state and are excluded.
+"""
+import numpy as np
+from scipy import linalg, optimize
+from scipy.integrate import odeint, trapezoid
+
+from linear import simulate_linear
+
+
+def steady_state_linear(A, tau, dose, dose_index: int = 0, output: int = 1,
+                        volume=1.0, n_points: int = 500, max_doses: int = 10000):
+    """Periodic steady state of a linear model with repeated doses.
+
+    :param A: rate matrices (n_params, n_states, n_states) or (n_states, n_states)
+    :param tau: dosing interval [hr], scalar or (n_params,)
+    :param dose: dose [mg], scalar or (n_params,)
+    :param dose_index: index of the dosed state (e.g. A_tablet)
+    :param output: index of the output state (e.g. A_central)
+    :param volume: volume to convert the output amount in a concentration
+    :param n_points: time points per dosing interval for trough and peak
+    :param max_doses: maximal number of doses for the time to 90% steady state
+    :return: dict of arrays (n_params,) with trough, peak and average output,
+        accumulation factor, number of doses and time to reach 90% of the
+        steady state average, the steady state after a dose `x_ss` and the
+        output over one dosing interval `profile` (n_params, n_points)
+    """
+    A = np.asarray(A, dtype=float)
+    if A.ndim == 2:
+        A = A[np.newaxis, :, :]
+    n_params = A.shape[0]
+    tau = np.broadcast_to(np.asarray(tau, dtype=float), (n_params,))
+    dose = np.broadcast_to(np.asarray(dose, dtype=float), (n_params,))
+    volume = np.broadcast_to(np.asarray(volume, dtype=float), (n_params,))
+
+    periodic = _periodic_states(A)
+    if not (periodic[dose_index] and periodic[output]):
+        raise ValueError("Dosed and output state must not be accumulating states.")
+    Ap = A[:, periodic][:, :, periodic]
+    n = Ap.shape[1]
+    k_dose = np.count_nonzero(periodic[:dose_index])
+    k_out = np.count_nonzero(periodic[:output])
+
+    # one-period propagator and its integral from augmented matrix exponential
+    M = np.zeros((n_params, 2 * n, 2 * n))
+    M[:, :n, :n] = Ap * tau[:, np.newaxis, np.newaxis]
+    M[:, :n, n:] = np.eye(n)
+    E = linalg.expm(M)
+    Phi = E[:, :n, :n]
+    W = E[:, :n, n:] * tau[:, np.newaxis, np.newaxis]  # int_0^tau exp(A t) dt
+
+    b = np.zeros((n_params, n))
+    b[:, k_dose] = dose
+    x_ss = np.linalg.solve(np.eye(n) - Phi, b[:, :, np.newaxis])[:, :, 0]
+
+    # profile over one dosing interval (time scaled with tau)
+    u = np.linspace(0.0, 1.0, num=n_points)
+    profile = simulate_linear(Ap * tau[:, np.newaxis, np.newaxis], x_ss, u)[:, :, k_out]
+    w = W[:, k_out, :]
+    average = np.einsum("pj,pj->p", w, x_ss) / tau
+
+    # accumulation relative to the first dose at the end of the interval
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accumulation = (
+            np.einsum("pj,pj->p", Phi[:, k_out, :], x_ss)
+            / np.einsum("pj,pj->p", Phi[:, k_out, :], b)
+        )
+
+    # average over dosing interval k is (1 - w Phi^k x_ss / w x_ss) * average
+    n_doses_90 = np.full(n_params, -1)
+    y = x_ss.copy()
+    total = np.einsum("pj,pj->p", w, x_ss)
+    for k in range(1, max_doses + 1):
+        y = np.einsum("pij,pj->pi", Phi, y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reached = (1.0 - np.einsum("pj,pj->p", w, y) / total >= 0.9) & (n_doses_90 < 0)
+        n_doses_90[reached] = k
+        if np.all(n_doses_90 > 0):
+            break
+
+    return {
+        "trough": profile.min(axis=1) / volume,
+        "peak": profile.max(axis=1) / volume,
+        "average": average / volume,
+        "accumulation": accumulation,
+        "n_doses_90": n_doses_90,
+        "t_90": np.where(n_doses_90 > 0, (n_doses_90 - 1) * tau, np.nan),
+        "x_ss": x_ss,
+        "profile": profile / volume[:, np.newaxis],
+    }
+
+
+def steady_state_shooting(dxdt, x0, tau: float, dose: float, args=(),
+                          dose_index: int = 0, output: int = 1, periodic=None,
+                          volume: float = 1.0, n_points: int = 500,
+                          max_doses: int = 10000, **kwargs):
+    """Periodic steady state of a nonlinear model by shooting.
+
+    :param dxdt: ODE function dxdt(x, t, *args)
+    :param x0: initial condition before the first dose
+    :param tau: dosing interval [hr]
+    :param dose: dose [mg]
+    :param args: arguments of the ODE function
+    :param dose_index: index of the dosed state
+    :param output: index of the output state
+    :param periodic: boolean mask of states with periodic steady state
+        (default: states which influence the dynamics at x0 + dose, i.e.
+        without accumulating states such as A_urine)
+    :param volume: volume to convert the output amount in a concentration
+    :param n_points: time points per dosing interval
+    :param max_doses: maximal number of doses for the time to 90% steady state
+    :param kwargs: additional arguments passed to odeint
+    :return: dict with trough, peak and average output, number of doses and
+        time to reach 90% of the steady state average (criterion of
+        `steady_state_linear` applied to the period map linearized at the
+        steady state) and the steady state after a dose `x_ss`
+    """
+    x0 = np.asarray(x0, dtype=float)
+    x_start = x0.copy()
+    x_start[dose_index] += dose
+    if periodic is None:
+        periodic = _periodic_states_jacobian(dxdt, x_start, args)
+    periodic = np.asarray(periodic, dtype=bool)
+    if not (periodic[dose_index] and periodic[output]):
+        raise ValueError("Dosed and output state must not be accumulating states.")
+    t = np.linspace(0.0, tau, num=n_points)
+
+    def period_map(xp):
+        x = np.zeros_like(x0)
+        x[periodic] = xp
+        x = odeint(dxdt, x, [0.0, tau], args=tuple(args), **kwargs)[-1]
+        x[dose_index] += dose
+        return x[periodic]
+
+    xp, info, ier, msg = optimize.fsolve(
+        lambda xp: period_map(xp) - xp, x_start[periodic], full_output=True
+    )
+    if ier != 1:
+        raise RuntimeError(f"Steady state not found: {msg}")
+
+    x_ss = np.zeros_like(x0)
+    x_ss[periodic] = xp
+    profile = odeint(dxdt, x_ss, t, args=tuple(args), **kwargs)[:, output]
+    total = trapezoid(profile, t)
+
+    # linearized period map (monodromy matrix M) and sensitivity w of the
+    # output integral over one interval by central differences at x_ss
+    n = xp.size
+    M = np.zeros((n, n))
+    w = np.zeros(n)
+    for j, k in enumerate(np.flatnonzero(periodic)):
+        h = 1e-6 * max(abs(x_ss[k]), 1.0)
+        x_plus, x_minus = x_ss.copy(), x_ss.copy()
+        x_plus[k] += h
+        x_minus[k] -= h
+        dy = (
+            odeint(dxdt, x_plus, t, args=tuple(args), **kwargs)
+            - odeint(dxdt, x_minus, t, args=tuple(args), **kwargs)
+        ) / (2 * h)
+        M[:, j] = dy[-1, periodic]
+        w[j] = trapezoid(dy[:, output], t)
+
+    # deviation from x_ss after dose k is M^(k-1) (x0 + dose - x_ss), the
+    # average over dosing interval k is (1 + w y / w x_ss) * average
+    n_doses_90 = -1
+    y = x_start[periodic] - xp
+    for k in range(1, max_doses + 1):
+        if 1.0 + w @ y / total >= 0.9:
+            n_doses_90 = k
+            break
+        y = M @ y
+
+    return {
+        "trough": profile.min() / volume,
+        "peak": profile.max() / volume,
+        "average": total / tau / volume,
+        "n_doses_90": n_doses_90,
+        "t_90": (n_doses_90 - 1) * tau if n_doses_90 > 0 else np.nan,
+        "x_ss": x_ss,
+    }
+
+
+def _periodic_states(A):
+    """States which influence the dynamics (not pure accumulators)."""
+    return np.any(A != 0, axis=(0, 1))
+
+
+def _periodic_states_jacobian(dxdt, x, args=()):
+    """States which influence the dynamics at x (nonzero Jacobian column)."""
+    x = np.asarray(x, dtype=float)
+    f = np.asarray(dxdt(x, 0.0, *args), dtype=float)
+    periodic = np.zeros(x.size, dtype=bool)
+    for k in range(x.size):
+        h = 1e-6 * max(abs(x[k]), 1.0)
+        x_h = x.copy()
+        x_h[k] += h
+        periodic[k] = np.any(np.asarray(dxdt(x_h, 0.0, *args), dtype=float) != f)
+    return periodic
@@ -0,0 +1,214 @@
+"""
+Models defined by stoichiometric matrix and mass action rate laws.
+
+The ODE functions of the course compute the rates of the reactions and
+combine them with the stoichiometric equation dx/dt = N v(x, p). Here a model
+is defined by its species, parameters and reactions (stoichiometric
+equation and rate parameter), similar to the sbmlutils factory. From this
+definition the vectorized ODE function and the analytical Jacobian
+(`Dfun` of odeint) are generated.
+"""
+import re
+from typing import List, NamedTuple
+
+import numpy as np
+from scipy.integrate import odeint
+
+
+class Reaction(NamedTuple):
+    """Reaction with mass action kinetics, v = k * prod(reactants**order).
+
+    equation: stoichiometric equation, e.g. "A_tablet -> A_central"
+    k: id of the rate parameter
+    """
+    sid: str
+    equation: str
+    k: str
+
+
+class StoichiometricModel:
+    """Model with stoichiometric matrix and mass action kinetics."""
+
+    # working attributes, not part of the model identity (see memo.py)
+    _memo_exclude = ("_p", "_A")
+
+    def __init__(self, sid: str, species: List[str], parameters: List[str],
+                 reactions: List[Reaction]):
+        self.sid = sid
+        self.species = list(species)
+        self.parameters = list(parameters)
+        self.reactions = list(reactions)
+
+        n_species, n_reactions = len(self.species), len(self.reactions)
+        self.N = np.zeros((n_species, n_reactions))  # stoichiometric matrix
+        orders = np.zeros((n_reactions, n_species))  # reactant orders
+        for j, reaction in enumerate(self.reactions):
+            lhs, rhs = reaction.equation.split("->")
+            for sid, stoichiometry in _parse_side(lhs):
+                i = self.species.index(sid)
+                self.N[i, j] -= stoichiometry
+                orders[j, i] += stoichiometry
+            for sid, stoichiometry in _parse_side(rhs):
+                self.N[self.species.index(sid), j] += stoichiometry
+
+        self.k_index = np.array(
+            [self.parameters.index(r.k) for r in self.reactions], dtype=int
+        )
+
+        # reactants per reaction padded to the maximal number of reactants
+        n_slots = max(1, int((orders > 0).sum(axis=1).max(initial=0)))
+        self._reactants = np.zeros((n_reactions, n_slots), dtype=int)
+        self._orders = np.zeros((n_reactions, n_slots))
+        for j in range(n_reactions):
+            idx = np.flatnonzero(orders[j])
+            self._reactants[j, :idx.size] = idx
+            self._orders[j, :idx.size] = orders[j, idx]
+        self._rows = np.arange(n_reactions)
+
+        # linear models (all reactions first order in a single reactant) use
+        # the rate matrix A = N diag(k) R with the reactant matrix R
+        self.linear = bool(np.all(orders.sum(axis=1) == 1) and np.all(orders.max(axis=1) == 1))
+        self._reactant = self._reactants[:, 0]
+        self.R = np.zeros((n_reactions, n_species))
+        self.R[self._rows, self._reactant] = 1.0
+        self._p = None  # parameters of the cached rate matrix
+        self._A = None
+
+    def __repr__(self):
+        return (
+            f"<StoichiometricModel {self.sid}: "
+            f"{len(self.species)} species, {len(self.reactions)} reactions>"
+        )
+
+    def rates(self, x, p) -> np.ndarray:
+        """Reaction rates v(x, p)."""
+        k = np.asarray(p, dtype=float)[self.k_index]
+        if self.linear:
+            return k * np.asarray(x)[self._reactant]
+        return k * np.prod(np.asarray(x)[self._reactants] ** self._orders, axis=1)
+
+    def dxdt(self, x, t, *p) -> np.ndarray:
+        """ODE function dx/dt = N v(x, p) with odeint signature.
+
+        Linear models evaluate dx/dt = A x with the cached rate matrix.
+        """
+        if self.linear:
+            return self._rate_matrix(p) @ x
+        return self.N @ self.rates(x, p)
+
+    def _rate_matrix(self, p) -> np.ndarray:
+        """Rate matrix of linear models, cached for the last parameters."""
+        if p != self._p:
+            k = np.asarray(p, dtype=float)[self.k_index]
+            self._A = self.N @ (k[:, np.newaxis] * self.R)
+            self._p = p
+        return self._A
+
+    def rate_jacobian(self, x, p) -> np.ndarray:
+        """Derivatives of the rates with respect to the species dv/dx."""
+        x = np.asarray(x, dtype=float)
+        k = np.asarray(p, dtype=float)[self.k_index]
+        if self.linear:
+            return k[:, np.newaxis] * self.R
+        xr = x[self._reactants]
+        factors = xr ** self._orders
+        dvdx = np.zeros((len(self.reactions), len(self.species)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for s in range(self._orders.shape[1]):
+                order = self._orders[:, s]
+                dfactor = np.where(order > 0, order * xr[:, s] ** (order - 1), 0.0)
+                others = np.prod(np.delete(factors, s, axis=1), axis=1)
+                dvdx[self._rows, self._reactants[:, s]] += k * dfactor * others
+        return dvdx
+
+    def parameter_jacobian(self, x, t, *p) -> np.ndarray:
+        """Derivatives of the ODE function with respect to the parameters N dv/dp."""
+        x = np.asarray(x, dtype=float)
+        dvdp = np.zeros((len(self.reactions), len(self.parameters)))
+        if self.linear:
+            dvdp[self._rows, self.k_index] = x[self._reactant]
+        else:
+            dvdp[self._rows, self.k_index] = np.prod(
+                x[self._reactants] ** self._orders, axis=1
+            )
+        return self.N @ dvdp
+
+    def jacobian(self, x, t, *p) -> np.ndarray:
+        """Analytical Jacobian d(dx/dt)/dx = N dv/dx, `Dfun` of odeint.
+
+        For linear models the constant (cached) rate matrix is returned, it
+        must not be modified.
+        """
+        if self.linear:
+            return self._rate_matrix(p)
+        return self.N @ self.rate_jacobian(x, p)
+
+    def rate_matrix(self, *p) -> np.ndarray:
+        """Rate matrix A of linear models (all reactions first order)."""
+        if not self.linear:
+            raise ValueError(f"Model '{self.sid}' is not linear in the species.")
+        return self._rate_matrix(p).copy()
+
+    def simulate(self, x0, t, *p, **kwargs) -> np.ndarray:
+        """Simulate the model with odeint and the analytical Jacobian.
+
+        :param x0: initial condition
+        :param t: time points
+        :param p: parameter values in the order of `parameters`
+        :param kwargs: additional arguments passed to odeint
+        :return: solution (n_times, n_species)
+        """
+        return odeint(self.dxdt, x0, t, args=tuple(p), Dfun=self.jacobian, **kwargs)
+
+
+def _parse_side(side: str):
+    """Species and stoichiometries of one side of a stoichiometric equation."""
+    terms = []
+    for term in side.split("+"):
+        term = term.strip()
+        if not term:
+            continue
+        match = re.fullmatch(r"(\d+(?:\.\d*)?)?\s*(\w+)", term)
+        if match is None:
+            raise ValueError(f"Invalid term in stoichiometric equation: '{term}'")
+        stoichiometry = float(match.group(1)) if match.group(1) else 1.0
+        terms.append((match.group(2), stoichiometry))
+    return terms
+
+
+# models of the course
+absorption_first_order = StoichiometricModel(
+    sid="absorption_first_order",
+    species=["A_tablet", "A_central", "A_urine"],
+    parameters=["ka", "ke"],
+    reactions=[
+        Reaction("ABSORPTION", "A_tablet -> A_central", "ka"),
+        Reaction("ELIMINATION", "A_central -> A_urine", "ke"),
+    ],
+)
+
+compartment_model = StoichiometricModel(
+    sid="compartment_model",
+    species=["A_tablet", "A_central", "B_central", "A_urine", "B_urine"],
+    parameters=["ka", "km", "ke"],
+    reactions=[
+        Reaction("va", "A_tablet -> A_central", "ka"),
+        Reaction("vm", "A_central -> B_central", "km"),
+        Reaction("vuA", "A_central -> A_urine", "ke"),
+        Reaction("vuB", "B_central -> B_urine", "ke"),
+    ],
+)
+
+
+def absorption_chain_model(n_transit: int = 4) -> StoichiometricModel:
+    """Absorption model with a chain of n_transit transit compartments."""
+    chain = ["A_tablet"] + [f"A{k}" for k in range(1, n_transit + 1)] + ["A_central"]
+    return StoichiometricModel(
+        sid=f"absorption_chain_{n_transit}",
+        species=["A_tablet", "A_central", "A_urine"] + chain[1:-1],
+        parameters=["ka", "ke"],
+        reactions=[
+            Reaction(f"v{k}", f"{chain[k]} -> {chain[k + 1]}", "ka")
+            for k in range(n_transit + 1)
+        ] + [Reaction("ve", "A_central -> A_urine", "ke")],
+    )
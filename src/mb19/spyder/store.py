@@ -0,0 +1,160 @@
+"""
+Chunked on-disk storage of large simulation campaigns.
+
+Instead of collecting the trajectories of all subjects in memory
+(`tcs.append(df)`), the results are streamed chunk by chunk to `.npy` files
+in a result directory together with the parameters of every subject:
+
+    results/
+        index.json          # names, parameters and chunk index
+        time.npy            # time points (n_times,)
+        chunk_00000.npy     # trajectories (n_subjects_chunk, n_times, n_states)
+        params_00000.npy    # parameters (n_subjects_chunk, n_parameters)
+
+The reader memory-maps the chunk files, so subjects, time windows and
+species are sliced without loading the complete results.
+"""
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+class ResultWriter:
+    """Stream simulation results in chunks to a result directory."""
+
+    def __init__(self, path: Path, time, names: List[str], parameters: List[str]):
+        """Create the result directory or continue an existing one.
+
+        Chunks written to an existing result directory are appended, the time
+        points, names and parameters must match the existing results.
+
+        :param path: result directory
+        :param time: time points (n_times,)
+        :param names: names of the states
+        :param parameters: names of the parameters
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.time = np.asarray(time, dtype=float)
+        index_path = self.path / "index.json"
+        if index_path.exists():
+            with open(index_path) as f_json:
+                self.index = json.load(f_json)
+            if (
+                self.index["names"] != list(names)
+                or self.index["parameters"] != list(parameters)
+                or not np.array_equal(np.load(self.path / "time.npy"), self.time)
+            ):
+                raise ValueError(
+                    f"Result directory '{self.path}' contains results with different "
+                    f"time points, names or parameters."
+                )
+            self.n_subjects = sum(c["n"] for c in self.index["chunks"])
+            return
+
+        np.save(self.path / "time.npy", self.time)
+        self.index = {
+            "names": list(names),
+            "parameters": list(parameters),
+            "n_times": int(self.time.size),
+            "chunks": [],
+        }
+        self.n_subjects = 0
+        self._write_index()
+
+    def write(self, x, params):
+        """Append a chunk of simulations.
+
+        :param x: trajectories (n, n_times, n_states)
+        :param params: parameters (n, n_parameters) or dict of arrays (n,)
+        """
+        x = np.asarray(x)
+        if isinstance(params, dict):
+            params = np.column_stack([params[key] for key in self.index["parameters"]])
+        params = np.asarray(params, dtype=float).reshape(x.shape[0], -1)
+
+        k = len(self.index["chunks"])
+        chunk = {
+            "data": f"chunk_{k:05d}.npy",
+            "params": f"params_{k:05d}.npy",
+            "start": self.n_subjects,
+            "n": int(x.shape[0]),
+        }
+        np.save(self.path / chunk["data"], x)
+        np.save(self.path / chunk["params"], params)
+        self.index["chunks"].append(chunk)
+        self.n_subjects += chunk["n"]
+        self._write_index()
+
+    def _write_index(self):
+        """Write the index atomically, so partial results remain readable."""
+        tmp_path = self.path / "index.json.tmp"
+        with open(tmp_path, "w") as f_json:
+            json.dump(self.index, f_json, indent=2)
+        os.replace(tmp_path, self.path / "index.json")
+
+
+class ResultReader:
+    """Lazy access to the results of a result directory."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "index.json") as f_json:
+            self.index = json.load(f_json)
+        self.names = self.index["names"]
+        self.parameters = self.index["parameters"]
+        self.time = np.load(self.path / "time.npy")
+        self._chunks = self.index["chunks"]
+        self._starts = np.array([c["start"] for c in self._chunks], dtype=int)
+        self._data = {}
+
+    def __len__(self) -> int:
+        return sum(c["n"] for c in self._chunks)
+
+    def chunk(self, k: int) -> np.ndarray:
+        """Memory-mapped trajectories of chunk k."""
+        if k not in self._data:
+            self._data[k] = np.load(self.path / self._chunks[k]["data"], mmap_mode="r")
+        return self._data[k]
+
+    def params(self) -> dict:
+        """Parameters of all subjects as dict of arrays."""
+        if not self._chunks:
+            return {key: np.empty(0) for key in self.parameters}
+        p = np.concatenate([
+            np.load(self.path / c["params"]) for c in self._chunks
+        ])
+        return {key: p[:, k] for k, key in enumerate(self.parameters)}
+
+    def get(self, subjects=None, start: float = None, end: float = None,
+            names: List[str] = None) -> np.ndarray:
+        """Load a subset of the results.
+
+        :param subjects: subject indices (slice or array), default all
+        :param start: start of the time window (inclusive)
+        :param end: end of the time window (inclusive)
+        :param names: selected states, default all
+        :return: trajectories (n_selected, n_times_window, n_selected_states)
+        """
+        # numpy indexing: negative indices, IndexError for out of range indices
+        indices = np.arange(len(self))
+        subjects = indices if subjects is None else np.atleast_1d(indices[subjects])
+
+        k0 = 0 if start is None else np.searchsorted(self.time, start, side="left")
+        k1 = self.time.size if end is None else np.searchsorted(self.time, end, side="right")
+        columns = (
+            slice(None) if names is None else [self.names.index(name) for name in names]
+        )
+
+        chunk_ids = np.searchsorted(self._starts, subjects, side="right") - 1
+        result = np.empty(
+            (subjects.size, k1 - k0, len(self.names) if names is None else len(names))
+        )
+        for k in np.unique(chunk_ids):
+            selected = chunk_ids == k
+            rows = subjects[selected] - self._starts[k]
+            result[selected] = self.chunk(k)[rows, k0:k1][:, :, columns]
+        return result
@@ -0,0 +1,108 @@
+"""
+Lightweight array-backed timecourse.
+
+Alternative to building a `pd.DataFrame` for every simulation and
+concatenating them. The data is stored in a single contiguous float64
+array with one row per column (time, species, ...), so columns are
+zero-copy views and appending rows only copies when the preallocated
+capacity is exhausted. Columns are accessed like DataFrame columns
+(`tc["A_central"]` or `tc.A_central`), conversion to pandas happens only
+on demand with `to_pandas`.
+"""
+from typing import List
+
+import numpy as np
+
+
+class Timecourse:
+    """Timecourse with named columns backed by one contiguous array."""
+
+    __slots__ = ("names", "_index", "_data", "_n")
+
+    def __init__(self, names: List[str], capacity: int = 0):
+        """Create empty timecourse.
+
+        :param names: column names
+        :param capacity: number of preallocated rows
+        """
+        self.names = list(names)
+        self._index = {name: k for k, name in enumerate(self.names)}
+        self._data = np.empty((len(self.names), capacity))
+        self._n = 0
+
+    @classmethod
+    def from_array(cls, x, names: List[str], time=None, capacity: int = 0) -> "Timecourse":
+        """Timecourse from a solution array (n_times, n_columns), e.g. of odeint.
+
+        If time is given it is added as first column "time".
+        """
+        x = np.asarray(x, dtype=float)
+        if time is not None:
+            names = ["time"] + list(names)
+        tc = cls(names, capacity=max(capacity, x.shape[0]))
+        tc._n = x.shape[0]
+        if time is not None:
+            tc._data[0, :tc._n] = time
+            tc._data[1:, :tc._n] = x.T
+        else:
+            tc._data[:, :tc._n] = x.T
+        return tc
+
+    @classmethod
+    def from_roadrunner(cls, s) -> "Timecourse":
+        """Timecourse from roadrunner simulation results (NamedArray)."""
+        return cls.from_array(s, names=s.colnames)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def shape(self):
+        return self._n, len(self.names)
+
+    def __repr__(self):
+        return f"<Timecourse {self._n} rows x {len(self.names)} columns: {self.names}>"
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Column as zero-copy view."""
+        return self._data[self._index[name], :self._n]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name.startswith("_") or name not in self._index:
+            raise AttributeError(name)
+        return self[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def append(self, rows):
+        """Append rows (n_rows, n_columns) or another timecourse with the same columns."""
+        if isinstance(rows, Timecourse):
+            rows = rows.to_numpy()
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        n_new = self._n + rows.shape[0]
+        if n_new > self._data.shape[1]:
+            # grow capacity geometrically
+            data = np.empty((len(self.names), max(n_new, 2 * self._data.shape[1])))
+            data[:, :self._n] = self._data[:, :self._n]
+            self._data = data
+        self._data[:, self._n:n_new] = rows.T
+        self._n = n_new
+
+    def to_numpy(self) -> np.ndarray:
+        """Data as array (n_rows, n_columns), a view of the internal data."""
+        return self._data[:, :self._n].T
+
+    def to_pandas(self):
+        """Convert to pandas DataFrame (copy)."""
+        import pandas as pd
+
+        return pd.DataFrame(self.to_numpy().copy(), columns=self.names)
+
+    @staticmethod
+    def concat(tcs: List["Timecourse"]) -> "Timecourse":
+        """Concatenate timecourses with the same columns with a single allocation."""
+        tc = Timecourse(tcs[0].names, capacity=sum(len(t) for t in tcs))
+        for t in tcs:
+            tc.append(t)
+        return tc
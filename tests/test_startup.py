@@ -0,0 +1,19 @@
+"""Import-time regression test of the headless CLI (`python -m mb19`)."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from mb19.__main__ import MODELS, check_startup  # noqa: E402
+
+# time budget of a simulate + NCA process [s]
+STARTUP_BUDGET = 0.5
+
+
+@pytest.mark.parametrize("model", list(MODELS))
+def test_startup(model):
+    result = check_startup(model, repeat=3)
+    assert result["slow_modules"] == []
+    assert result["total_time"] <= STARTUP_BUDGET